@@ -3,17 +3,117 @@ from google.genai import types
 import os
 from dotenv import load_dotenv
 import asyncio
-from anyio import to_thread
+import time
+from contextlib import aclosing
 
-from computer_use.main import gemini_computer_use
+import admission
+import genai_recorder
+import local_search
+from browser_jobs import BrowserJob, BrowserJobManager, gemini_computer_use
+from memory_store import MemoryStore
+from profiles import ConfigCache, Profile, profiles
+from semantic_cache import SemanticCache
+from response_cache import ResponseCache, cache_key
+from router import ModelRouter, Route
+from intents import looks_like_browser_task
+import metrics
+import tracing
+import url_index
+import usage
+from scheduler import gate
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_CLOUD_API")
 
+SYSTEM_INSTRUCTION = (
+    "You are a smart financial advisor with the ability to fill out forms for users to apply for different resources. "
+    "You have RAG capabilities along with the ability to use Gemini-Computer-Use, and interact with UI. "
+    "Do not be afraid to scroll and search for your target, accuracy matters most. "
+)
+
+
+def function_calls(parts: list[types.Part]) -> list[types.FunctionCall]:
+    return [part.function_call for part in (parts or []) if part.function_call]
+
+
+def function_responses(calls: list[types.FunctionCall], results: list[dict]) -> types.Content:
+    """The user turn that answers a model turn's function calls, in the same order."""
+    return types.Content(
+        role="user",
+        parts=[
+            types.Part(function_response=types.FunctionResponse(id=fn.id, name=fn.name, response=result))
+            for fn, result in zip(calls, results)
+        ],
+    )
+
+
+def merge_text_parts(parts: list[types.Part]) -> list[types.Part]:
+    """Joins streamed text deltas back into whole parts, for sending the turn back."""
+    merged = []
+    for part in parts:
+        prev = merged[-1] if merged else None
+        if (
+            prev is not None
+            and part.text is not None
+            and prev.text is not None
+            and bool(part.thought) == bool(prev.thought)
+            and not part.thought_signature
+        ):
+            merged[-1] = prev.model_copy(update={"text": prev.text + part.text})
+        else:
+            merged.append(part)
+    return merged
+
+
+def skipped_results(calls: list[types.FunctionCall], reason: str) -> list[dict]:
+    """Responses for function calls that are not run because a budget ran out."""
+    return [{"status": "skipped", "error": f"Not run: out of {reason}", "text": ""} for _ in calls]
+
+
+def browser_result(job: BrowserJob) -> dict:
+    """start_browser's response: the outcome if the job is done, else where it got to."""
+    result = {"job_id": job.id, "status": job.status, "steps": job.steps, "url": job.current_url}
+    if job.status == "succeeded":
+        result["final_reasoning"] = job.final_reasoning
+        result["text"] = "[Completed the task in a browser.]"
+    elif job.done:
+        result["error"] = job.error
+        result["text"] = f"[The browser task {job.status}: {job.error}]"
+    else:
+        result["text"] = f"[Started a browser task to complete this. Track its progress at /jobs/{job.id}.]"
+    return result
+
 
 class RAG_Agent:
     def __init__(self):
-        self.client = genai.Client(vertexai=True, api_key=api_key)
+        # Recorded or replayed when GENAI_RECORD is set (see genai_recorder.py)
+        self.client = genai_recorder.wrap(genai.Client(vertexai=True, api_key=api_key))
+        # Conversation history for stateful callers (e.g. the WebSocket chat)
+        self.memory = MemoryStore(namespace="rag_sessions")
+        # Answers to paraphrased repeat questions (see semantic_cache.py)
+        self.cache = SemanticCache()
+        # Exact repeats, plus coalescing of identical in-flight requests (see response_cache.py)
+        self.answers = ResponseCache(namespace="rag_answers")
+        self.model = "gemini-2.5-flash"
+        # Simple lookups skip thinking (see router.py)
+        self.router = ModelRouter("rag", self.model)
+        # start_browser runs as a background job so the request never blocks on a browser
+        self.jobs = BrowserJobManager(limiter=admission.tools["start_browser"])
+        # Tool loop: at most this many rounds of function calls per answer, and at
+        # most this many calls of one round running at once
+        self.max_tool_rounds = int(os.getenv("RAG_MAX_TOOL_ROUNDS", "4"))
+        self.tool_concurrency = int(os.getenv("RAG_TOOL_CONCURRENCY", "4"))
+        # How long start_browser waits for its job before answering with the job's status
+        self.browser_tool_wait_s = float(os.getenv("BROWSER_TOOL_WAIT_S", "45"))
+        # Where answers are grounded: "vertex" (the Vertex RAG corpus), "local" (the
+        # local BM25 index, no network; see local_search.py) or "both" (the corpus,
+        # plus local excerpts sent with each question)
+        self.retrieval = os.getenv("RAG_RETRIEVAL", "vertex").lower()
+        if self.retrieval not in ("vertex", "local", "both"):
+            raise ValueError(f"Unknown RAG_RETRIEVAL {self.retrieval!r} (expected vertex, local or both)")
+        # Signed-in users get their details in the system instruction (see profiles.py)
+        self.profiles = profiles
+        self.configs = ConfigCache()
 
         # --- Tool: Retrieval (Vertex RAG Store) ---
         self.retrieval_tool = types.Tool(
@@ -28,6 +128,26 @@ class RAG_Agent:
             )
         )
 
+        # --- Tool: Search of the local BM25 index (see local_search.py) ---
+        self.search_fn_tool = types.Tool(
+            function_declarations=[
+                types.FunctionDeclaration(
+                    name="search_documents",
+                    description=(
+                        "Search UCF documents (health, legal, recreation, scholarship and housing guides) "
+                        "for passages about a topic. Use it when the excerpts given with the question don't cover it."
+                    ),
+                    parameters=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={
+                            "query": types.Schema(type=types.Type.STRING, description="What to look for."),
+                        },
+                        required=["query"],
+                    ),
+                )
+            ]
+        )
+
         # --- Tool: Function declaration for Computer Use ---
         self.browser_fn_tool = types.Tool(
             function_declarations=[
@@ -47,7 +167,7 @@ class RAG_Agent:
                             ),
                             "initial_url": types.Schema(
                                 type=types.Type.STRING,
-                                description="Optional starting URL.",
+                                description="Optional starting URL. Leave it out unless you know the exact page; known UCF pages are picked automatically.",
                             ),
                         },
                         required=["query"],
@@ -56,10 +176,9 @@ class RAG_Agent:
             ]
         )
 
-        # Shared generation config
+        # Shared generation config, for callers without a profile
         self.gen_config = types.GenerateContentConfig(
-            system_instruction="You are a smart financial advisor with the ability to fill out forms for users to apply for different resources. You have RAG capabilities along with the ability to use Gemini-Computer-Use, and interact with UI. Do not be afraid to scroll and search for your target, accuracy matters most. " \
-            "User information: first name: Adam, last name: Mouedden, full name: Adam Mouedden, email: adam.mouedden@gmail.com, phone number: 123-456-7890, discord: adammouedden",
+            system_instruction=SYSTEM_INSTRUCTION,
             temperature=1,
             top_p=0.95,
             seed=0,
@@ -70,52 +189,401 @@ class RAG_Agent:
                 types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
                 types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
             ],
-            tools=[self.retrieval_tool, self.browser_fn_tool],
+            tools=self.retrieval_tools() + [self.browser_fn_tool],
             thinking_config=types.ThinkingConfig(thinking_budget=-1),
         )
 
-    async def generate(self, prompt: str) -> str:
-        model = "gemini-2.5-flash"
+    def retrieval_tools(self) -> list[types.Tool]:
+        if self.retrieval == "local":
+            # Fully offline: excerpts come with the question, and the model can search for more
+            return [self.search_fn_tool]
+        return [self.retrieval_tool]
+
+    def personalize(self, profile: Profile) -> types.GenerateContentConfig:
+        # A shallow copy: tools, safety settings and thinking config are shared with gen_config
+        return self.gen_config.model_copy(update={"system_instruction": SYSTEM_INSTRUCTION + profile.prompt()})
+
+    def config_for(self, user_id: str = None) -> types.GenerateContentConfig:
+        """The user's personalized config, or gen_config for anonymous and unknown users."""
+        return self.config_from(self.profiles.get(user_id) if user_id else None)
+
+    async def aconfig_for(self, user_id: str = None) -> types.GenerateContentConfig:
+        """config_for for async callers: the profile lookup doesn't block the event loop."""
+        return self.config_from(await self.profiles.aget(user_id) if user_id else None)
+
+    def config_from(self, profile: Profile = None) -> types.GenerateContentConfig:
+        if profile is None:
+            return self.gen_config
+        return self.configs.get(profile, self.personalize)
+
+    @tracing.traced()
+    async def generate(self, prompt: str, user_id: str = None) -> str:
+        config = await self.aconfig_for(user_id)
+        # Browser tasks are one-off actions: never cached, never coalesced
+        if looks_like_browser_task(prompt):
+            self.cache.record_bypass()
+            answer, _ = await self.generate_uncached(prompt, config, owner=user_id)
+            return answer
+
+        # Identical concurrent prompts share one upstream call (per config, so per user)
+        key = cache_key(self.model, prompt, config)
+        return await self.answers.get_or_compute(key, lambda: self.generate_semantic(prompt, config, user_id))
+
+    @tracing.traced()
+    async def generate_semantic(
+        self, prompt: str, config: types.GenerateContentConfig = None, owner: str = None
+    ) -> tuple[str, bool]:
+        cached = self.cache.get(prompt) if self.shares_answers(config) else None
+        if cached is not None:
+            return cached, True
+
+        start = time.perf_counter()
+        answer, one_off = await self.generate_uncached(prompt, config, owner)
+        self.cache_store(prompt, answer, time.perf_counter() - start, one_off, config)
+        return answer, not one_off
+
+    @tracing.traced()
+    async def generate_uncached(
+        self, prompt: str, config: types.GenerateContentConfig = None, owner: str = None
+    ) -> tuple[str, bool]:
+        """Returns (answer, one_off).
 
-        contents = [
+        one_off answers (from a tool call, or cut down to fit a budget) must not be cached.
+        owner is who browser jobs started on the way are filed under (see call_tool).
+        """
+        # On the async client so the server's event loop keeps serving other
+        # requests (see generate_stream for the streaming variant)
+        route = self.router.route(prompt)
+        contents = await self.abuild_contents(prompt)
+        out = []
+        used_tools = degraded = False
+        model_s = 0.0
+        resp = None
+        for round_ in range(self.max_tool_rounds + 1):
+            call_config, cut = self.round_config(route, final=round_ == self.max_tool_rounds, config=config)
+            degraded = degraded or cut
+            start = time.perf_counter()
+            with gate.interactive(), metrics.gemini_call(route.model, "rag"):
+                resp = await self.client.aio.models.generate_content(
+                    model=route.model,
+                    contents=contents,
+                    config=call_config,
+                )
+            model_s += time.perf_counter() - start
+            usage.record(resp)
+
+            content = resp.candidates[0].content if resp.candidates else None
+            if content is None:
+                break
+            out.extend(part.text for part in (content.parts or []) if part.text and not part.thought)
+            calls = function_calls(content.parts)
+            if not calls:
+                break
+            spent = usage.exhausted()
+            if spent:
+                # No tool rounds past the budget; the next (final) call answers without them
+                degraded = True
+                results = skipped_results(calls, spent)
+            else:
+                # Run the calls and send their results back until the model is done
+                used_tools = True
+                results = [None] * len(calls)
+                async with aclosing(self.run_tools(calls, prompt, owner)) as finished:
+                    async for i, result in finished:
+                        results[i] = result
+            out.extend(result["text"] for result in results if result["text"])
+            contents += [content, function_responses(calls, results)]
+
+        self.router.record(route, prompt, model_s, resp, used_tools)
+        return " ".join(out).strip(), used_tools or degraded
+
+    @tracing.traced()
+    def generate_sync(self, prompt: str, user_id: str = None) -> str:
+        """Blocking variant of generate for CLI use; tool calls run one after another."""
+        route = self.router.route(prompt)
+        contents = self.build_contents(prompt)
+        user_config = self.config_for(user_id)
+        out = []
+        for round_ in range(self.max_tool_rounds + 1):
+            config, _ = self.round_config(route, final=round_ == self.max_tool_rounds, config=user_config)
+            with gate.interactive(), metrics.gemini_call(route.model, "rag"):
+                resp = self.client.models.generate_content(
+                    model=route.model,
+                    contents=contents,
+                    config=config,
+                )
+            usage.record(resp)
+
+            content = resp.candidates[0].content if resp.candidates else None
+            if content is None:
+                break
+            out.extend(part.text for part in (content.parts or []) if part.text and not part.thought)
+            calls = function_calls(content.parts)
+            if not calls:
+                break
+            spent = usage.exhausted()
+            results = skipped_results(calls, spent) if spent else [self.call_tool_sync(fn, prompt) for fn in calls]
+            out.extend(result["text"] for result in results if result["text"])
+            contents += [content, function_responses(calls, results)]
+
+        return " ".join(out).strip()
+
+    def round_config(
+        self, route: Route, final: bool, config: types.GenerateContentConfig = None
+    ) -> tuple[types.GenerateContentConfig, bool]:
+        """Config for one model call of the tool loop, based on config (the user's,
+        or gen_config). Returns (config, degraded).
+
+        The final round may not call functions, so the model answers with what it
+        has. Once a budget has run out every round is the final one.
+        """
+        config, degraded = usage.fit_config(route.apply(config or self.gen_config))
+        if usage.exhausted():
+            final = degraded = True
+        if final:
+            config = config.model_copy(
+                update={
+                    "tool_config": types.ToolConfig(
+                        function_calling_config=types.FunctionCallingConfig(mode=types.FunctionCallingConfigMode.NONE)
+                    )
+                }
+            )
+        return config, degraded
+
+    async def run_tools(self, calls: list[types.FunctionCall], prompt: str, owner: str = None):
+        """Runs the function calls of one model turn concurrently, at most
+        tool_concurrency at once. Yields (index, result) as each one finishes."""
+        limit = asyncio.Semaphore(self.tool_concurrency)
+
+        async def run(i: int, fn: types.FunctionCall):
+            async with limit:
+                return i, await self.call_tool(fn, prompt, owner=owner)
+
+        tasks = [asyncio.ensure_future(run(i, fn)) for i, fn in enumerate(calls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shares_answers(self, config: types.GenerateContentConfig = None) -> bool:
+        # The semantic cache is keyed on the prompt alone, so only answers written
+        # without anyone's profile go in it; personalized ones stay in the exact
+        # cache, whose key includes the config
+        return config is None or config is self.gen_config
+
+    def cache_lookup(self, prompt: str, config: types.GenerateContentConfig = None):
+        """Returns a cached answer, or None. Browser tasks always bypass the cache."""
+        if looks_like_browser_task(prompt):
+            self.cache.record_bypass()
+            return None
+        cached = self.answers.get(cache_key(self.model, prompt, config or self.gen_config))
+        if cached is not None:
+            return cached
+        return self.cache.get(prompt) if self.shares_answers(config) else None
+
+    def cache_store(self, prompt: str, answer: str, latency_s: float, one_off: bool, config: types.GenerateContentConfig = None):
+        # Answers that came out of a tool call describe one-off actions, and budget-limited
+        # ones are worse than usual; never replay either
+        if one_off or looks_like_browser_task(prompt):
+            return
+        self.answers.put(cache_key(self.model, prompt, config or self.gen_config), answer)
+        if self.shares_answers(config):
+            self.cache.put(prompt, answer, latency_s)
+
+    def build_contents(self, prompt: str, history: list[types.Content] = ()) -> list[types.Content]:
+        # Pre-retrieval: the best local passages go in front of the question, so most
+        # answers need no search round-trip at all
+        excerpts = local_search.context(prompt) if self.retrieval != "vertex" else ""
+        return self.contents_with(prompt, excerpts, history)
+
+    async def abuild_contents(self, prompt: str, history: list[types.Content] = ()) -> list[types.Content]:
+        """build_contents for the event loop: a search that has to rebuild the index reads files first."""
+        excerpts = await asyncio.to_thread(local_search.context, prompt) if self.retrieval != "vertex" else ""
+        return self.contents_with(prompt, excerpts, history)
+
+    def contents_with(self, prompt: str, excerpts: str, history: list[types.Content] = ()) -> list[types.Content]:
+        parts = [{"text": prompt}]
+        if excerpts:
+            parts.insert(0, {"text": excerpts})
+        return list(history) + [
             types.Content(
                 role="user",
-                parts=[{"text": prompt}]
+                parts=parts
             )
         ]
 
-        # Single-shot first (you can also do streaming; see note below)
-        resp = self.client.models.generate_content(
-            model=model,
-            contents=contents,
-            config=self.gen_config,
-        )
+    @tracing.traced()
+    async def generate_stream(self, prompt: str, session_id: str = None, user_id: str = None):
+        """Streaming variant of generate.
+
+        When session_id is given, earlier turns of that session are sent along and
+        this exchange is remembered for the next call. user_id picks the profile
+        the answer is personalized with.
+
+        Yields event dicts as the answer is produced:
+          {"type": "text", "text": ...}          for each text delta
+          {"type": "tool_call", "name": ..., "args": ...}  before a tool runs
+          {"type": "tool_result", "name": ..., "text": ..., "status": ...}  once it finished
+          {"type": "done", "text": ...}          with the full answer
+          {"type": "error", "message": ...}      if generation failed
+        """
+        history = self.memory.history(session_id)[0] if session_id else []
+        user_config = await self.aconfig_for(user_id)
+        # Earlier turns change what a prompt means, so only stateless calls use the cache
+        cached = None if history else self.cache_lookup(prompt, user_config)
+        if cached is not None:
+            yield {"type": "text", "text": cached}
+            yield {"type": "done", "text": cached, "cached": True}
+            return
+        start = time.perf_counter()
 
-        # If the model asks to call a tool, handle it:
-        # (Function calls appear in parts as {"functionCall": {...}})
         out = []
-        for cand in (resp.candidates or []):
-            for part in (cand.content.parts or []):
-                # 1) Handle function calls
-                if getattr(part, "function_call", None):
-                    fn = part.function_call
-                    if fn.name == "start_browser":
-                        args = fn.args or {}
-                        q = args.get("query", prompt)
-                        initial_url = args.get("initial_url", "http://www.google.com")
-                        # Run your Playwright loop ONLY when requested
-                        await to_thread.run_sync(gemini_computer_use, q, initial_url)
-                        # Optionally append a short note to the final text
-                        out.append("[Opened browser to investigate and complete the task.]")
-                    # If you add more functions later, handle them here.
-                # 2) Collect normal text
-                if getattr(part, "text", None):
-                    out.append(part.text)
+        used_tools = degraded = False
+        model_s = 0.0
+        last_chunk = None
+        route = self.router.route(prompt)
+        contents = await self.abuild_contents(prompt, history)
+        try:
+            for round_ in range(self.max_tool_rounds + 1):
+                config, cut = self.round_config(route, final=round_ == self.max_tool_rounds, config=user_config)
+                degraded = degraded or cut
+                # Every part of the model's turn, to send back along with the function results
+                parts = []
+                round_start = time.perf_counter()
+                with gate.interactive(), metrics.gemini_call(route.model, "rag_stream"):
+                    stream = await self.client.aio.models.generate_content_stream(
+                        model=route.model,
+                        contents=contents,
+                        config=config,
+                    )
+                    last_chunk = None
+                    async for chunk in stream:
+                        last_chunk = chunk
+                        for cand in (chunk.candidates or []):
+                            if not cand.content:
+                                continue
+                            for part in (cand.content.parts or []):
+                                parts.append(part)
+                                if part.function_call:
+                                    fn = part.function_call
+                                    yield {"type": "tool_call", "name": fn.name, "args": dict(fn.args or {})}
+                                elif part.text and not part.thought:
+                                    out.append(part.text)
+                                    yield {"type": "text", "text": part.text}
+                model_s += time.perf_counter() - round_start
+                # Usage metadata is cumulative; the last chunk carries the call's totals
+                if last_chunk is not None:
+                    usage.record(last_chunk)
 
-        return " ".join(out).strip()
+                calls = function_calls(parts)
+                if not calls:
+                    break
+                spent = usage.exhausted()
+                if spent:
+                    # No tool rounds past the budget; the next (final) call answers without them
+                    degraded = True
+                    results = skipped_results(calls, spent)
+                    for fn, result in zip(calls, results):
+                        yield {"type": "tool_result", "name": fn.name, **result}
+                else:
+                    # Independent calls run concurrently; each result is streamed as it lands
+                    used_tools = True
+                    results = [None] * len(calls)
+                    async with aclosing(self.run_tools(calls, prompt, owner=user_id or session_id)) as finished:
+                        async for i, result in finished:
+                            results[i] = result
+                            # Its own paragraph, between the text before and after it
+                            note = f"\n\n{result['text']}\n\n" if result["text"] else ""
+                            out.append(note)
+                            yield {"type": "tool_result", "name": calls[i].name, **result, "text": note}
+                contents += [types.Content(role="model", parts=merge_text_parts(parts)), function_responses(calls, results)]
+            self.router.record(route, prompt, model_s, last_chunk, used_tools)
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
+            return
+
+        answer = "".join(out).strip()
+        if not history:
+            self.cache_store(prompt, answer, time.perf_counter() - start, used_tools or degraded, user_config)
+        if session_id:
+            self.memory.append(
+                session_id,
+                types.Content(role="user", parts=[types.Part(text=prompt)]),
+                types.Content(role="model", parts=[types.Part(text=answer)]),
+            )
+        yield {"type": "done", "text": answer}
+
+    @tracing.traced()
+    async def call_tool(self, fn: types.FunctionCall, prompt: str, owner: str = None) -> dict:
+        """Runs a function call requested by the model and returns its response.
+
+        The response goes back to the model as a FunctionResponse; its "text" is a
+        short note for the user ("" if there is nothing to say). owner is who a
+        browser job counts against for fair sharing and BUDGET_BROWSER (the user,
+        else the session, else "anonymous").
+        """
+        if fn.name == "start_browser":
+            args = fn.args or {}
+            try:
+                job = self.jobs.submit(
+                    args.get("query", prompt), args.get("initial_url"), owner=owner or "anonymous"
+                )
+            except admission.Overloaded:
+                metrics.TOOL_CALLS.inc(tool=fn.name, outcome="rejected")
+                return {
+                    "status": "rejected",
+                    "error": "All browsers are busy",
+                    "text": "[All browsers are busy right now; please try this task again in a few minutes.]",
+                }
+            metrics.TOOL_CALLS.inc(tool=fn.name, outcome="submitted")
+            # Short tasks finish while we wait and the model can answer from the result;
+            # longer ones keep running and the model is told where to follow them
+            deadline = time.monotonic() + self.browser_tool_wait_s
+            while not job.done and time.monotonic() < deadline:
+                await asyncio.sleep(0.25)
+            return browser_result(job)
+        if fn.name == "search_documents":
+            # Milliseconds usually, but the first search (or one after a source changed) rebuilds the index
+            return await asyncio.to_thread(self.search_documents, fn, prompt)
+        # If you add more functions later, handle them here.
+        metrics.TOOL_CALLS.inc(tool=fn.name, outcome="unknown")
+        return {"error": f"Unknown function {fn.name}", "text": ""}
+
+    def search_documents(self, fn: types.FunctionCall, prompt: str) -> dict:
+        query = (fn.args or {}).get("query", prompt)
+        hits = local_search.index.search(query)
+        metrics.TOOL_CALLS.inc(tool=fn.name, outcome="found" if hits else "empty")
+        return {
+            "results": [{"source": p.citation(), "title": p.title, "text": p.text} for _, p in hits],
+            "text": "",
+        }
+
+    @tracing.traced()
+    def call_tool_sync(self, fn: types.FunctionCall, prompt: str) -> dict:
+        """Blocking variant of call_tool for CLI use: runs the browser inline."""
+        if fn.name == "start_browser":
+            args = fn.args or {}
+            q = args.get("query", prompt)
+            initial_url = url_index.starting_url(q, args.get("initial_url"))
+            # Run your Playwright loop ONLY when requested
+            result = gemini_computer_use(q, initial_url)
+            metrics.TOOL_CALLS.inc(tool=fn.name, outcome="ran")
+            return {
+                "status": "succeeded",
+                "final_reasoning": result["final_reasoning"],
+                "url": result["url"],
+                "text": "[Opened browser to investigate and complete the task.]",
+            }
+        if fn.name == "search_documents":
+            return self.search_documents(fn, prompt)
+        # If you add more functions later, handle them here.
+        metrics.TOOL_CALLS.inc(tool=fn.name, outcome="unknown")
+        return {"error": f"Unknown function {fn.name}", "text": ""}
 
 
 if __name__ == "__main__":
     agent = RAG_Agent()
     user_input = input("You: ")
-    print(f"RAG Bot: {agent.generate(user_input)}")
+    print(f"RAG Bot: {agent.generate_sync(user_input)}")
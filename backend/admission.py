@@ -0,0 +1,187 @@
+"""
+Admission control for the FastAPI server.
+
+Every endpoint has a concurrency limit with a bounded wait queue in front of it.
+A request either gets a slot, waits for one (up to a timeout), or is rejected
+right away with Overloaded, which the server turns into a 429 (queue full) or a
+503 (waited too long) with a Retry-After header. Tools get a separate, non-blocking
+limit on how many may be in flight at once (e.g. browser jobs).
+
+Limits come from the environment, e.g. ADMISSION_RAG_CONCURRENCY=8,
+ADMISSION_RAG_QUEUE=32, ADMISSION_RAG_TIMEOUT_S=10, TOOL_START_BROWSER_LIMIT=4.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Defaults per endpoint: (max concurrent, max queued, queue timeout in seconds)
+ENDPOINT_DEFAULTS = {
+    "chat": (16, 64, 10.0),
+    "rag": (8, 32, 10.0),
+    "rag_stream": (8, 32, 10.0),
+    "ws": (64, 0, 0.0),
+}
+
+TOOL_DEFAULTS = {
+    "start_browser": 4,
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, name: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{name} is overloaded: {reason}")
+        self.name = name
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout_s: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self.avg_service_s = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead of a new request to drain through the slots
+        return max(1, math.ceil(self.avg_service_s * (self.waiting + 1) / self.max_concurrent))
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, 429, self.retry_after(), "queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if future.done():
+                # The slot was handed over just as we timed out; give it back.
+                self.release()
+            else:
+                future.cancel()
+            self.timed_out += 1
+            raise Overloaded(self.name, 503, self.retry_after(), "timed out waiting for a slot")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait_s += waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+
+    def release(self, held_s: float = None):
+        if held_s is not None:
+            self.avg_service_s = 0.9 * self.avg_service_s + 0.1 * held_s
+        # Hand the slot straight to the next waiter so it cannot be stolen
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_s": round(self.total_wait_s / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_s": round(self.max_wait_s, 4),
+            "avg_service_s": round(self.avg_service_s, 3),
+        }
+
+
+class ToolLimiter:
+    """Non-blocking, thread-safe cap on in-flight tool runs (released from worker threads)."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                raise Overloaded(self.name, 503, 30, f"{self.limit} runs already in progress")
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
+
+
+def _endpoint_limiter(name: str) -> AdmissionLimiter:
+    concurrent, queue, timeout = ENDPOINT_DEFAULTS[name]
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionLimiter(
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", concurrent)),
+        int(os.getenv(f"{prefix}_QUEUE", queue)),
+        float(os.getenv(f"{prefix}_TIMEOUT_S", timeout)),
+    )
+
+
+endpoints = {name: _endpoint_limiter(name) for name in ENDPOINT_DEFAULTS}
+tools = {
+    name: ToolLimiter(name, int(os.getenv(f"TOOL_{name.upper()}_LIMIT", limit)))
+    for name, limit in TOOL_DEFAULTS.items()
+}
+
+
+def stats() -> dict:
+    return {
+        "endpoints": {name: limiter.stats() for name, limiter in endpoints.items()},
+        "tools": {name: limiter.stats() for name, limiter in tools.items()},
+    }
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
@@ -15,6 +16,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Reads the bearer token of a request; no token is not an error here (see current_user)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="signin", auto_error=False)
+
 # Database connection
 def get_db_connection():
     return psycopg2.connect(
@@ -41,7 +45,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def authenticate_user(email: str, password: str):
+def find_user(email: str, password: str):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
@@ -56,6 +60,40 @@ async def authenticate_user(email: str, password: str):
         cur.close()
         conn.close()
 
+async def authenticate_user(email: str, password: str):
+    # The query and bcrypt both block, so they run off the event loop
+    return await asyncio.to_thread(find_user, email, password)
+
+def user_from_token(token: Optional[str]) -> Optional[str]:
+    """The email a token was issued to, or None without a token. A bad or expired token is a 401."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    if not payload.get("sub"):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload["sub"]
+
+# Dependencies for routes: the signed-in user's email
+async def optional_user(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[str]:
+    return user_from_token(token)
+
+async def current_user(token: Optional[str] = Depends(oauth2_scheme)) -> str:
+    user = user_from_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not signed in",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
 # FastAPI endpoint for sign in
 async def signin(form_data: OAuth2PasswordRequestForm):
     user = await authenticate_user(form_data.username, form_data.password)
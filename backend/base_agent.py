@@ -2,27 +2,146 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 import os
+import time
+
+import genai_recorder
+from memory_store import MemoryStore
+from response_cache import ResponseCache, cache_key
+from router import ModelRouter
+import metrics
+import tracing
+import usage
+from scheduler import gate
 
 load_dotenv()
 
 class Agent:
-    def __init__(self):
-        self.memory = []
+    def __init__(self, summarize: bool = None):
+        # Per-session, token-bounded history (see memory_store.py)
+        self.memory = MemoryStore(namespace="chat_sessions")
+        # Roll turns that fall out of the token budget into a running summary
+        self.summarize = summarize if summarize is not None else os.getenv("MEMORY_SUMMARIZE", "1") == "1"
+        # Exact repeats of the same conversation state, and coalescing of identical in-flight calls
+        self.answers = ResponseCache(namespace="chat_answers")
         
         key = os.getenv("GEMINI_API")
-        self.client = genai.Client(api_key=key)
+        # Recorded or replayed when GENAI_RECORD is set (see genai_recorder.py)
+        self.client = genai_recorder.wrap(genai.Client(api_key=key))
+        self.model = 'gemini-2.5-flash'
+        self.summary_model = 'gemini-2.5-flash-lite'
+        # Greetings and simple lookups go to the lite model without thinking (see router.py)
+        self.router = ModelRouter("chat", self.model, light_model=self.summary_model)
         self.system_prompt = "You are an agent. Never respond in key-value pairs, only ever in text."
 
-    def chat(self, prompt):
-        self.memory.append({"User":prompt})
-        self.input = str(self.memory).replace("[", "").replace("]", "")
-        #print(self.input)
-        
-        config = types.GenerateContentConfig(system_instruction=self.system_prompt)
-        response = self.client.models.generate_content(model='gemini-2.5-flash', contents=self.input, config=config,)
-        self.memory.append({"Agent":response.text})
-        
-        return response.text
+    @tracing.traced()
+    def chat(self, prompt, session_id="default"):
+        user_turn, contents, config, route = self._prepare(prompt, session_id)
+        key = cache_key(route.model, contents, config)
+        text = self.answers.get(key)
+        if text is None:
+            start = time.perf_counter()
+            with gate.interactive(), metrics.gemini_call(route.model, "chat"):
+                response = self.client.models.generate_content(model=route.model, contents=contents, config=config,)
+            usage.record(response)
+            self.router.record(route, prompt, time.perf_counter() - start, response)
+            text = response.text
+            self.answers.put(key, text)
+        overflow = self._remember(session_id, user_turn, text)
+        if overflow and self.summarize:
+            summary_prompt, summary_config = self._summary_request(session_id, overflow)
+            with metrics.gemini_call(self.summary_model, "summary"):
+                summary = self.client.models.generate_content(model=self.summary_model, contents=summary_prompt, config=summary_config)
+            usage.record(summary)
+            self.memory.set_summary(session_id, summary.text or "")
+        return text
+
+    @tracing.traced()
+    async def achat(self, prompt, session_id="default"):
+        """Same as chat, but awaits the async client so the event loop is never blocked."""
+        user_turn, contents, config, route = self._prepare(prompt, session_id)
+
+        async def generate():
+            start = time.perf_counter()
+            with gate.interactive(), metrics.gemini_call(route.model, "chat"):
+                response = await self.client.aio.models.generate_content(model=route.model, contents=contents, config=config,)
+            usage.record(response)
+            self.router.record(route, prompt, time.perf_counter() - start, response)
+            return response.text, True
+
+        text = await self.answers.get_or_compute(cache_key(route.model, contents, config), generate)
+        overflow = self._remember(session_id, user_turn, text)
+        if overflow and self.summarize:
+            summary_prompt, summary_config = self._summary_request(session_id, overflow)
+            with metrics.gemini_call(self.summary_model, "summary"):
+                summary = await self.client.aio.models.generate_content(model=self.summary_model, contents=summary_prompt, config=summary_config)
+            usage.record(summary)
+            self.memory.set_summary(session_id, summary.text or "")
+        return text
+
+    @tracing.traced()
+    async def achat_stream(self, prompt, session_id="default"):
+        """Streaming variant of achat. Yields the same event dicts as RAG_Agent.generate_stream."""
+        user_turn, contents, config, route = self._prepare(prompt, session_id)
+        out = []
+        start = time.perf_counter()
+        try:
+            with gate.interactive(), metrics.gemini_call(route.model, "chat_stream"):
+                stream = await self.client.aio.models.generate_content_stream(model=route.model, contents=contents, config=config,)
+                last_chunk = None
+                async for chunk in stream:
+                    last_chunk = chunk
+                    if chunk.text:
+                        out.append(chunk.text)
+                        yield {"type": "text", "text": chunk.text}
+            if last_chunk is not None:
+                usage.record(last_chunk)
+            self.router.record(route, prompt, time.perf_counter() - start, last_chunk)
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
+            return
+
+        text = "".join(out)
+        overflow = self._remember(session_id, user_turn, text)
+        if overflow and self.summarize:
+            summary_prompt, summary_config = self._summary_request(session_id, overflow)
+            with metrics.gemini_call(self.summary_model, "summary"):
+                summary = await self.client.aio.models.generate_content(model=self.summary_model, contents=summary_prompt, config=summary_config)
+            usage.record(summary)
+            self.memory.set_summary(session_id, summary.text or "")
+        yield {"type": "done", "text": text}
+
+    def _prepare(self, prompt, session_id):
+        turns, summary = self.memory.history(session_id)
+        user_turn = types.Content(role="user", parts=[types.Part(text=prompt)])
+
+        system_prompt = self.system_prompt
+        if summary:
+            system_prompt += f"\n\nSummary of the earlier conversation with this user: {summary}"
+        route = self.router.route(prompt)
+        # Cut down (no thinking, capped output) when the request's budget runs low
+        config, _ = usage.fit_config(route.apply(types.GenerateContentConfig(system_instruction=system_prompt)))
+        return user_turn, turns + [user_turn], config, route
+
+    def _remember(self, session_id, user_turn, text):
+        model_turn = types.Content(role="model", parts=[types.Part(text=text or "")])
+        return self.memory.append(session_id, user_turn, model_turn)
+
+    def _summary_request(self, session_id, overflow):
+        _, summary = self.memory.history(session_id)
+        transcript = "\n".join(
+            f"{turn.role}: {' '.join(part.text or '' for part in (turn.parts or []))}" for turn in overflow
+        )
+        prompt = (
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"Older messages to fold in:\n{transcript}\n\n"
+            "Write the updated summary."
+        )
+        config = types.GenerateContentConfig(
+            system_instruction="You keep a short running summary of a conversation. Keep names, facts and open requests; drop small talk. Answer with the summary only.",
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            max_output_tokens=300,
+        )
+        return prompt, config
     
 
 if __name__=="__main__":
@@ -0,0 +1,78 @@
+"""
+Concurrency benchmark for the /chat and /RAG handlers.
+
+Fires N parallel requests at the FastAPI app (in-process, through httpx's ASGI
+transport) with the Gemini client replaced by fake_genai.FakeClient. With the
+async code path, N requests should finish in about one request's latency; the
+"blocking" baseline calls the sync client from inside the event loop the way the
+handlers used to, and takes about N times as long.
+
+Admission control (admission.py) would otherwise queue every request past
+ADMISSION_RAG_CONCURRENCY (8 by default) and this would time the queue, not the
+client, so the benchmark raises the /chat and /RAG limits to 1000 unless they
+are set in the environment.
+
+    python bench_concurrency.py --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+# The agents only need a key to construct their clients; the fake never uses it.
+os.environ.setdefault("GEMINI_API", "bench")
+os.environ.setdefault("GOOGLE_CLOUD_API", "bench")
+# Read when admission is imported, so before the server is
+for endpoint in ("CHAT", "RAG"):
+    os.environ.setdefault(f"ADMISSION_{endpoint}_CONCURRENCY", "1000")
+
+import server
+from fake_genai import FakeClient
+
+
+async def run_endpoint(http: httpx.AsyncClient, path: str, n: int) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *(http.get(path, params={"prompt": f"question {i}"}) for i in range(n))
+    )
+    elapsed = time.perf_counter() - start
+    failed = [r.status_code for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{path}: {len(failed)} requests failed: {failed[:5]}")
+    return elapsed
+
+
+async def run_blocking_baseline(n: int) -> float:
+    # What the handlers used to do: a sync Gemini call inside an async def
+    async def handler(i):
+        return server.get_agent().chat(f"question {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+async def main(n: int, latency_s: float):
+    server.get_agent().client = FakeClient(latency_s=latency_s)
+    server.get_retrieval_agent().client = FakeClient(latency_s=latency_s)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        print(f"{n} parallel requests, {latency_s:.2f}s fake model latency\n")
+        print(f"{'path':<22}{'wall (s)':>10}{'x one request':>16}")
+        for path in ("/chat", "/RAG"):
+            elapsed = await run_endpoint(http, path, n)
+            print(f"{path:<22}{elapsed:>10.2f}{elapsed / latency_s:>16.1f}")
+
+    elapsed = await run_blocking_baseline(n)
+    print(f"{'blocking baseline':<22}{elapsed:>10.2f}{elapsed / latency_s:>16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
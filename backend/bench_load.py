@@ -0,0 +1,309 @@
+"""
+Load test for the API server, offline: the real FastAPI app under uvicorn, with
+every Gemini call answered by fake_genai.FakeClient.
+
+The server runs on its own event loop in a background thread and is driven over
+real HTTP from the main thread. For each path and concurrency level, that many
+clients send requests back to back until --requests have completed (or for
+--duration seconds), and the run reports:
+
+    rps             completed requests per second
+    p50/p95/p99     request latency; for /RAG/stream the time to the whole answer
+    ttfb p50        /RAG/stream only: time to the first event
+    errors          non-2xx responses and failed requests (by status in --json)
+    loop lag        how late a 10ms timer on the server's event loop fires
+                    (p99 / max): anything that blocks the loop shows up here
+    rss MB          resident memory of the process at the end of the run (and
+                    the growth during it); read from /proc. Without /proc only
+                    the peak is available, so the column is "peak MB" instead
+                    and growth means a new peak
+
+Prompts are random word salads, so the answer caches only see repeats when
+--repeat asks for them. A share of model calls (--tool-rate) answers with a
+start_browser call; its browser job is simulated by a sleep of --browser-latency.
+
+    python bench_load.py --paths /chat /RAG /RAG/stream --concurrency 1 8 32 --requests 200
+    python bench_load.py --latency 0.8 --tool-rate 0.2 --json results.json
+
+Server settings (ADMISSION_*, STATE_BACKEND, ...) come from the environment as
+usual. The clients share the process (and the GIL) with the server, so absolute
+numbers are pessimistic; compare runs with each other, not with production.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+# The agents only need a key to construct their clients; the fake never uses it.
+os.environ.setdefault("GEMINI_API", "bench")
+os.environ.setdefault("GOOGLE_CLOUD_API", "bench")
+# Don't write routing decisions from benchmark traffic
+os.environ.setdefault("ROUTER_LOG", "")
+
+import uvicorn
+
+import browser_jobs
+import server
+from fake_genai import FakeClient
+
+WORDS = (
+    "scholarship grant loan housing tuition deadline advisor office hours parking permit "
+    "library printing dining meal plan counseling clinic dental vision insurance tutoring "
+    "internship career fair resume transcript registration waitlist major minor credit "
+    "semester summer abroad exchange research lab stipend fellowship club event ticket "
+    "gym pool climbing kayak intramural soccer volleyball recreation wellness legal lawyer "
+    "lease roommate shuttle bike campus orientation graduation commencement diploma refund"
+).split()
+LAG_INTERVAL_S = 0.01
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+# "current" where /proc/self/statm exists, else "peak" (see rss_mb)
+RSS_KIND = "current" if os.path.exists("/proc/self/statm") else "peak"
+
+
+def rss_mb() -> float:
+    """Current resident set size, or the peak one where RSS_KIND is "peak"."""
+    if RSS_KIND == "current":
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class LagMonitor:
+    """Samples how late a short timer fires on an event loop."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL_S)
+            self.samples.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL_S))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+    def take(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+class ServerThread:
+    """uvicorn serving server.app on a free local port, on its own loop and thread."""
+
+    def __init__(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on"))
+        self.loop = asyncio.new_event_loop()
+        self.lag = LagMonitor()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        self.loop.call_soon_threadsafe(self.lag.start)
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.lag.stop)
+        self.server.should_exit = True
+        self.thread.join()
+
+    def take_lag(self) -> list[float]:
+        # Swapping the list out from another thread is safe under the GIL
+        return self.lag.take()
+
+
+def fake_browser(latency_s: float):
+    def run(query, initial_url=None, on_step=None, cancel_token=None, **kwargs):
+        cancel_token.sleep(latency_s)
+        return {"final_reasoning": f"Simulated browser task: {query}", "url": initial_url}
+
+    return run
+
+
+def install_fakes(args):
+    options = dict(latency_s=args.latency, chunks=args.chunks, tool_call_rate=args.tool_rate, usage=True, seed=args.seed)
+    server.get_agent().client = FakeClient(**options)
+    server.get_retrieval_agent().client = FakeClient(**options)
+    browser_jobs.gemini_computer_use = fake_browser(args.browser_latency)
+
+
+class Prompts:
+    def __init__(self, repeat: float, seed: int):
+        self.repeat = repeat
+        self.random = random.Random(seed)
+        self.seen: list[str] = []
+
+    def next(self) -> str:
+        if self.seen and self.random.random() < self.repeat:
+            return self.random.choice(self.seen)
+        prompt = " ".join(self.random.sample(WORDS, 6))
+        self.seen.append(prompt)
+        return prompt
+
+
+async def one_request(http: httpx.AsyncClient, path: str, prompt: str, worker: int) -> tuple[float, float, str]:
+    """Returns (latency, time to first byte, outcome)."""
+    params = {"prompt": prompt}
+    if path == "/chat":
+        # One conversation per simulated user, like real traffic
+        params["session_id"] = f"load-{worker}"
+    start = time.perf_counter()
+    try:
+        if path.endswith("/stream"):
+            ttfb = None
+            async with http.stream("GET", path, params=params) as response:
+                async for line in response.aiter_lines():
+                    if ttfb is None and line.startswith("data:"):
+                        ttfb = time.perf_counter() - start
+                    if line.startswith("data:") and '"type": "error"' in line:
+                        return time.perf_counter() - start, ttfb or 0.0, "stream error"
+            outcome = str(response.status_code)
+        else:
+            response = await http.get(path, params=params)
+            ttfb, outcome = None, str(response.status_code)
+    except httpx.HTTPError as e:
+        return time.perf_counter() - start, 0.0, type(e).__name__
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed if ttfb is None else ttfb, outcome
+
+
+async def run_level(http, srv: ServerThread, prompts: Prompts, path: str, concurrency: int, args) -> dict:
+    latencies, ttfbs, outcomes = [], [], Counter()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    remaining = args.requests
+
+    async def worker(i: int):
+        nonlocal remaining
+        while (deadline is None and remaining > 0) or (deadline is not None and time.perf_counter() < deadline):
+            remaining -= 1
+            latency, ttfb, outcome = await one_request(http, path, prompts.next(), i)
+            outcomes[outcome] += 1
+            if outcome.startswith("2"):
+                latencies.append(latency)
+                ttfbs.append(ttfb)
+
+    rss_before = rss_mb()
+    srv.take_lag()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - start
+    lag = srv.take_lag()
+    rss_after = rss_mb()
+
+    ok = len(latencies)
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": sum(outcomes.values()),
+        "ok": ok,
+        "errors": sum(outcomes.values()) - ok,
+        "outcomes": dict(outcomes),
+        "wall_s": wall,
+        "rps": ok / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "ttfb_p50_s": percentile(ttfbs, 50),
+        "mean_s": statistics.fmean(latencies) if latencies else 0.0,
+        "loop_lag_p99_ms": percentile(lag, 99) * 1000,
+        "loop_lag_max_ms": max(lag, default=0.0) * 1000,
+        "rss_kind": RSS_KIND,
+        "rss_mb": rss_after,
+        "rss_growth_mb": rss_after - rss_before,
+    }
+
+
+def print_row(r: dict):
+    ttfb = f"{r['ttfb_p50_s'] * 1000:>9.0f}" if r["path"].endswith("/stream") else f"{'-':>9}"
+    print(
+        f"{r['path']:<13}{r['concurrency']:>5}{r['rps']:>9.1f}"
+        f"{r['p50_s'] * 1000:>9.0f}{r['p95_s'] * 1000:>9.0f}{r['p99_s'] * 1000:>9.0f}{ttfb}"
+        f"{r['errors']:>8}{r['loop_lag_p99_ms']:>10.1f}{r['loop_lag_max_ms']:>9.1f}"
+        f"{r['rss_mb']:>9.1f}{r['rss_growth_mb']:>+8.1f}"
+    )
+
+
+async def drive(srv: ServerThread, args) -> list[dict]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{srv.port}", timeout=args.timeout, limits=limits) as http:
+        # One request per path first, so lazy initialization isn't billed to the first level
+        for path in args.paths:
+            await one_request(http, path, "warm up", 0)
+
+        how_long = f"{args.duration:.0f}s" if args.duration else f"{args.requests} requests"
+        print(
+            f"{how_long} per level, {args.latency:.2f}s fake model latency, "
+            f"tool-call rate {args.tool_rate:.0%}, repeat rate {args.repeat:.0%}\n"
+        )
+        print(
+            f"{'path':<13}{'conc':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb ms':>9}"
+            f"{'errors':>8}{'lag p99':>10}{'lag max':>9}{'rss MB' if RSS_KIND == 'current' else 'peak MB':>9}{'+MB':>8}"
+        )
+        # Shared by all levels, so a level never replays the prompts of the one before
+        prompts = Prompts(args.repeat, args.seed)
+        results = []
+        for path in args.paths:
+            for concurrency in args.concurrency:
+                result = await run_level(http, srv, prompts, path, concurrency, args)
+                print_row(result)
+                results.append(result)
+        return results
+
+
+def main(args):
+    install_fakes(args)
+    with ServerThread() as srv:
+        results = asyncio.run(drive(srv, args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", nargs="+", default=["/chat", "/RAG"], help="endpoints to load: /chat, /RAG, /RAG/stream")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per level")
+    parser.add_argument("--duration", type=float, default=0, help="seconds per level instead of a request count")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model latency per call, seconds")
+    parser.add_argument("--chunks", type=int, default=None, help="chunks per streamed answer (default: one per word)")
+    parser.add_argument("--tool-rate", type=float, default=0.0, help="share of model calls that call start_browser")
+    parser.add_argument("--browser-latency", type=float, default=1.0, help="simulated browser task duration, seconds")
+    parser.add_argument("--repeat", type=float, default=0.0, help="share of prompts that repeat an earlier one")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    main(parser.parse_args())
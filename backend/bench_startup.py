@@ -0,0 +1,138 @@
+"""
+Startup benchmark for the backend server: how long until a fresh process can
+answer its first request.
+
+Each run starts a new interpreter that imports server.py, runs the app's
+lifespan startup and sends two requests through httpx's ASGI transport, with
+genai.Client replaced by fake_genai.FakeClient. Reported per startup mode
+(medians over --runs):
+
+    process         interpreter start to exit, as seen from outside
+    import          `import server`
+    startup         lifespan startup (the WARM_UP_ON_STARTUP work, if enabled)
+    first request   time to the first response, including lazy initialization
+    next request    a second request on the warm process, for comparison
+    browser loaded  whether Playwright got imported along the way
+
+    python bench_startup.py --runs 5 --path /RAG --importtime 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODES = {
+    "lazy": {},
+    "warm": {"WARM_UP_ON_STARTUP": "1"},
+    "warm+browser": {"WARM_UP_ON_STARTUP": "1", "WARM_UP_BROWSER": "1"},
+}
+
+CHILD_ENV = {
+    # The agents only need a key to construct their clients; the fake never uses it.
+    "GEMINI_API": "bench",
+    "GOOGLE_CLOUD_API": "bench",
+    # Don't write routing decisions from benchmark traffic
+    "ROUTER_LOG": "",
+}
+
+
+def child(path: str, latency_s: float):
+    """Runs in the fresh interpreter; prints one JSON line of timings."""
+    start = time.perf_counter()
+    import server
+
+    import_s = time.perf_counter() - start
+
+    import httpx
+    from google import genai
+
+    from fake_genai import FakeClient
+
+    # The agents build their clients lazily, so swap the class rather than the instances
+    genai.Client = lambda **kwargs: FakeClient(latency_s=latency_s)
+
+    async def requests() -> dict:
+        start = time.perf_counter()
+        async with server.app.router.lifespan_context(server.app):
+            startup_s = time.perf_counter() - start
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+                timings = []
+                for prompt in ("what scholarships are open right now", "where is the financial aid office"):
+                    start = time.perf_counter()
+                    response = await http.get(path, params={"prompt": prompt})
+                    response.raise_for_status()
+                    timings.append(time.perf_counter() - start)
+        return {"startup_s": startup_s, "first_s": timings[0], "next_s": timings[1]}
+
+    result = {"import_s": import_s, **asyncio.run(requests())}
+    result["browser_loaded"] = "playwright.sync_api" in sys.modules
+    print(json.dumps(result))
+
+
+def run_once(mode: str, path: str, latency_s: float) -> dict:
+    env = {**os.environ, **CHILD_ENV, **MODES[mode]}
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", "--path", path, "--latency", str(latency_s)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    process_s = time.perf_counter() - start
+    return {"process_s": process_s, **json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def print_importtime(top: int):
+    """The modules that cost the most to import, by their own (not cumulative) time."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        env={**os.environ, **CHILD_ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    print(f"\nslowest imports under `import server` (of {len(rows)} modules)\n")
+    print(f"{'self ms':>9}{'cumulative ms':>15}  module")
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{self_us / 1000:>9.1f}{cumulative_us / 1000:>15.1f}  {name}")
+
+
+def main(runs: int, path: str, latency_s: float, modes: list[str], importtime: int):
+    print(f"{runs} fresh processes per mode, first request to {path}, {latency_s:.2f}s fake model latency\n")
+    print(f"{'mode':<14}{'process s':>10}{'import s':>10}{'startup s':>11}{'first req s':>13}{'next req s':>12}  browser loaded")
+    for mode in modes:
+        results = [run_once(mode, path, latency_s) for _ in range(runs)]
+        median = {key: statistics.median(r[key] for r in results) for key in ("process_s", "import_s", "startup_s", "first_s", "next_s")}
+        print(
+            f"{mode:<14}{median['process_s']:>10.3f}{median['import_s']:>10.3f}{median['startup_s']:>11.3f}"
+            f"{median['first_s']:>13.3f}{median['next_s']:>12.3f}  {any(r['browser_loaded'] for r in results)}"
+        )
+    if importtime:
+        print_importtime(importtime)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/RAG", help="endpoint for the timed requests (/RAG or /chat)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.path, args.latency)
+    else:
+        main(args.runs, args.path, args.latency, args.modes, args.importtime)
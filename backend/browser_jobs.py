@@ -0,0 +1,344 @@
+"""
+Background jobs for start_browser tool calls.
+
+A browser task can take minutes, so instead of holding the HTTP request open the
+task is submitted here and a job id is returned at once. Jobs run in the
+automation lane of scheduler.py: a few worker threads (BROWSER_JOB_WORKERS, or
+one per pooled browser when BROWSER_POOL_SIZE is set, see
+computer_use/browser_pool.py) take queued jobs in turn per user, and each user
+may have AUTOMATION_MAX_PER_USER jobs queued or running. Their model calls give
+way to interactive traffic. Progress (step count, current URL, latest
+reasoning) is kept on the job and can be polled or streamed by id. Each job has a
+CancelToken with a deadline (BROWSER_JOB_TIMEOUT_S), and can be cancelled by id.
+
+Nothing browser-related is loaded until the first job is submitted (or warm_up()
+is called): the Computer Use stack and Playwright are imported, and the pool
+launched, on first use, so constructing a manager costs nothing at startup.
+
+Jobs run in the worker process that accepted them. With a shared state backend
+(see state.py) their status and events are also published there, so any worker
+can report or stream a job, and cancelling one elsewhere leaves a request that
+the owning worker picks up at its next step.
+
+Jobs submitted without a starting URL (or with just a search engine) start on
+the best matching known page from url_index.py instead, so the agent doesn't
+spend its first turns searching for it.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+from admission import Overloaded, ToolLimiter
+from computer_use.cancellation import CancelToken, Cancelled
+import state
+import tracing
+import url_index
+import usage
+from scheduler import FairShareQueue, PriorityGate, gate as default_gate
+
+if TYPE_CHECKING:
+    from computer_use.browser_pool import BrowserPool
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+def gemini_computer_use(*args, **kwargs) -> dict:
+    # Imported on first use: computer_use.main pulls in Playwright, rich and termcolor
+    from computer_use.main import gemini_computer_use
+
+    return gemini_computer_use(*args, **kwargs)
+
+
+@dataclass
+class BrowserJob:
+    id: str
+    query: str
+    initial_url: str
+    owner: str = "anonymous"
+    status: str = "queued"  # queued -> running -> succeeded | failed | cancelled
+    steps: int = 0
+    current_url: Optional[str] = None
+    reasoning: Optional[str] = None
+    final_reasoning: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Progress events, in order; streamed to clients by index.
+    events: list[dict] = field(default_factory=list)
+    # Tokens and steps spent so far (see usage.py)
+    usage: dict = field(default_factory=dict)
+    token: CancelToken = field(default_factory=CancelToken)
+    # Span of the request that submitted the job; the job's own trace hangs off it
+    trace_parent: Optional[tracing.Span] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "query": self.query,
+            "initial_url": self.initial_url,
+            "owner": self.owner,
+            "status": self.status,
+            "steps": self.steps,
+            "current_url": self.current_url,
+            "reasoning": self.reasoning,
+            "final_reasoning": self.final_reasoning,
+            "error": self.error,
+            "usage": self.usage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class BrowserJobManager:
+    def __init__(
+        self,
+        max_workers: int = None,
+        max_jobs: int = None,
+        pool: "BrowserPool" = None,
+        limiter: ToolLimiter = None,
+        gate: PriorityGate = None,
+        backend: state.StateBackend = None,
+    ):
+        self.max_jobs = max_jobs or int(os.getenv("BROWSER_JOB_HISTORY", "200"))
+        self.timeout_s = float(os.getenv("BROWSER_JOB_TIMEOUT_S", "600"))
+        # With BROWSER_POOL_SIZE set, the pool is launched along with the workers
+        self.pool = pool
+        self.pool_size = pool.size if pool else int(os.getenv("BROWSER_POOL_SIZE", "0"))
+        # One lane worker per pooled browser, so the pool's own queue never fills up
+        self.max_workers = self.pool_size or max_workers or int(os.getenv("BROWSER_JOB_WORKERS", "2"))
+        self.max_per_owner = int(os.getenv("AUTOMATION_MAX_PER_USER", "2"))
+        # Caps queued + running jobs; a slot is held until the job finishes
+        self.limiter = limiter
+        # Model calls made by jobs yield to interactive traffic
+        self.gate = gate or default_gate
+        # Where job status is published for other workers, for BROWSER_JOB_STATUS_TTL_S
+        self.backend = backend or state.backend
+        self.status_ttl_s = float(os.getenv("BROWSER_JOB_STATUS_TTL_S", "86400"))
+        self._queue = FairShareQueue()
+        self._workers: list[threading.Thread] = []
+        self._per_owner: dict[str, int] = {}
+        self._jobs: OrderedDict[str, BrowserJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, query: str, initial_url: str = None, owner: str = "anonymous") -> BrowserJob:
+        """Queues a browser task. Raises Overloaded if no more browser work can be taken on."""
+        job = BrowserJob(
+            id=uuid.uuid4().hex,
+            query=query,
+            initial_url=url_index.starting_url(query, initial_url),
+            owner=owner,
+            token=CancelToken(self.timeout_s),
+            trace_parent=tracing.current_span(),
+        )
+        with self._lock:
+            if self._per_owner.get(owner, 0) >= self.max_per_owner:
+                raise Overloaded("start_browser", 429, 30, f"{self.max_per_owner} browser tasks already queued or running for this user")
+            self._start_workers()
+            if self.limiter:
+                self.limiter.acquire()
+            self._per_owner[owner] = self._per_owner.get(owner, 0) + 1
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._emit(job, "status")
+        self._queue.put(owner, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[BrowserJob]:
+        """The job, or for a job run by another worker a snapshot of its last published state."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._published(job_id)
+
+    def list(self) -> list[BrowserJob]:
+        with self._lock:
+            jobs = dict(self._jobs)
+        if self.backend.shared:
+            for job_id, data, _ in self.backend.items("browser_jobs"):
+                if job_id not in jobs:
+                    jobs[job_id] = BrowserJob(**data["job"], events=data["events"])
+        return sorted(jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str, reason: str = "cancelled by client") -> Optional[BrowserJob]:
+        """Asks a job to stop; it finishes as "cancelled" within one browser step."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._published(job_id)
+            if job is not None and not job.done:
+                # Picked up by the worker running it (see _cancel_requested)
+                self.backend.set("browser_job_cancels", job_id, reason, ttl_s=self.timeout_s)
+            return job
+        if job.done:
+            return job
+        job.token.cancel(reason)
+        with self._lock:
+            # A queued job is finished right away instead of waiting for a lane worker
+            queued = job.status == "queued"
+            if queued:
+                job.status = "cancelled"
+        if queued:
+            job.error = reason
+            self._finish(job, "cancelled")
+        return job
+
+    def _forget_finished(self):
+        # Caller holds the lock. Only finished jobs are dropped; running ones are kept.
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
+
+    def warm_up(self):
+        """Loads the Computer Use stack and starts the workers (and pool) ahead of the first job."""
+        import computer_use.main  # noqa: F401
+
+        with self._lock:
+            self._start_workers()
+
+    def _start_workers(self):
+        # Caller holds the lock. Started on first use so importing the server stays cheap.
+        if self.pool is None and self.pool_size > 0:
+            from computer_use.browser_pool import BrowserPool
+
+            self.pool = BrowserPool(size=self.pool_size).start()
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker, name=f"browser-job-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                if not self.pool:
+                    self._run(job)
+                    continue
+                try:
+                    self.pool.submit(lambda browser: self._run(job, browser)).result()
+                except Exception as e:
+                    # The pool fails the task without calling _run if no browser could be launched
+                    if not job.done:
+                        job.error = str(e)
+                        self._finish(job, "failed")
+            finally:
+                self._queue.task_done(job.owner)
+
+    def shutdown(self):
+        self._queue.close()
+        if self.pool:
+            self.pool.shutdown()
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+        return {
+            "workers": self.max_workers,
+            "running": running,
+            "queued": self._queue.qsize(),
+            "queued_by_user": self._queue.waiting_by_owner(),
+            "max_per_user": self.max_per_owner,
+        }
+
+    def _emit(self, job: BrowserJob, event_type: str, **extra):
+        job.events.append({"type": event_type, **job.to_dict(), **extra})
+        if self.backend.shared:
+            self.backend.set(
+                "browser_jobs",
+                job.id,
+                {"job": job.to_dict(), "events": list(job.events)},
+                ttl_s=self.status_ttl_s,
+                max_entries=self.max_jobs,
+            )
+
+    def _published(self, job_id: str) -> Optional[BrowserJob]:
+        if not self.backend.shared:
+            return None
+        data = self.backend.get("browser_jobs", job_id)
+        return BrowserJob(**data["job"], events=data["events"]) if data else None
+
+    def _cancel_requested(self, job: BrowserJob):
+        """Cancels the job if another worker was asked to cancel it."""
+        if self.backend.shared:
+            reason = self.backend.get("browser_job_cancels", job.id)
+            if reason:
+                job.token.cancel(reason)
+
+    def _run(self, job: BrowserJob, browser=None):
+        # Worker threads don't inherit the submitting request's context
+        with tracing.span("browser_job", parent=job.trace_parent, job_id=job.id, owner=job.owner) as span:
+            self._run_traced(job, browser)
+            span.set_attribute("status", job.status)
+
+    def _run_traced(self, job: BrowserJob, browser=None):
+        self._cancel_requested(job)
+        with self._lock:
+            if job.done:
+                return
+            # Claimed under the lock, so cancel() can't also finish a job that timed out while queued
+            job.status = "cancelled" if job.token.cancelled else "running"
+        if job.status != "running":
+            job.error = job.token.reason
+            self._finish(job, "cancelled")
+            return
+        job.started_at = time.time()
+        self._emit(job, "status")
+
+        def on_step(step: dict):
+            job.steps = step["step"]
+            job.current_url = step["url"] or job.current_url
+            job.reasoning = step["reasoning"]
+            job.usage = spent.to_dict()
+            self._emit(job, "step")
+            self._cancel_requested(job)
+
+        try:
+            # Each job has its own budget (BUDGET_BROWSER_*) and is charged to its owner
+            with usage.metered(user_id=job.owner, budget=usage.Budget.from_env("BUDGET_BROWSER")) as spent:
+                try:
+                    result = gemini_computer_use(
+                        job.query,
+                        job.initial_url,
+                        on_step=on_step,
+                        browser=browser,
+                        cancel_token=job.token,
+                        model_gate=lambda: self.gate.automation(job.token),
+                    )
+                finally:
+                    job.usage = spent.to_dict()
+            job.final_reasoning = result["final_reasoning"]
+            job.current_url = result["url"] or job.current_url
+            status = "succeeded"
+        except Cancelled as e:
+            job.error = str(e)
+            status = "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            status = "failed"
+        self._finish(job, status)
+
+    def _finish(self, job: BrowserJob, status: str):
+        with self._lock:
+            # Only once per job: the owner's count and the limiter slot are released here
+            if job.finished_at is not None:
+                return
+            job.status = status
+            job.finished_at = time.time()
+            self._per_owner[job.owner] -= 1
+            if not self._per_owner[job.owner]:
+                del self._per_owner[job.owner]
+        if self.limiter:
+            self.limiter.release()
+        self._emit(job, "done")
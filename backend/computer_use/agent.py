@@ -12,7 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
-from typing import Literal, Optional, Union, Any
+import contextlib
+from typing import Literal, Optional, Union, Any, Callable, ContextManager
 from google import genai
 from google.genai import types
 import termcolor
@@ -24,12 +25,16 @@ from google.genai.types import (
     FunctionResponse,
     FinishReason,
 )
-import time
 from rich.console import Console
 from rich.table import Table
 
 from computer_use.computers import EnvState, Computer
+from computer_use.cancellation import CancelToken, Cancelled
 from dotenv import load_dotenv
+import genai_recorder
+import metrics
+import tracing
+import usage
 
 MAX_RECENT_TURN_WITH_SCREENSHOTS = 3
 PREDEFINED_COMPUTER_USE_FUNCTIONS = [
@@ -67,17 +72,32 @@ class BrowserAgent:
         query: str,
         model_name: str,
         verbose: bool = True,
+        on_step: Optional[Callable[[dict], None]] = None,
+        cancel_token: Optional[CancelToken] = None,
+        model_gate: Optional[Callable[[], ContextManager]] = None,
     ):
         self._browser_computer = browser_computer
         self._query = query
         self._model_name = model_name
         self._verbose = verbose
+        # Called after every iteration with {"step", "url", "reasoning", "status"}.
+        self._on_step = on_step
+        # Checked between model turns and actions; see computer_use/cancellation.py.
+        self._cancel_token = cancel_token or CancelToken()
+        # Held around every model call, e.g. to give way to interactive traffic.
+        self._model_gate = model_gate or contextlib.nullcontext
         self.final_reasoning = None
-        self._client = genai.Client(
-            api_key=os.environ.get("GEMINI_API_KEY"),
-            vertexai=os.environ.get("USE_VERTEXAI", "0").lower() in ["true", "1"],
-            project=os.environ.get("VERTEXAI_PROJECT"),
-            location=os.environ.get("VERTEXAI_LOCATION"),
+        self.last_reasoning = None
+        self.current_url = None
+        self.steps = 0
+        # Recorded or replayed when GENAI_RECORD is set (see genai_recorder.py)
+        self._client = genai_recorder.wrap(
+            genai.Client(
+                api_key=os.environ.get("GEMINI_API_KEY"),
+                vertexai=os.environ.get("USE_VERTEXAI", "0").lower() in ["true", "1"],
+                project=os.environ.get("VERTEXAI_PROJECT"),
+                location=os.environ.get("VERTEXAI_LOCATION"),
+            )
         )
         self._contents: list[Content] = [
             Content(
@@ -197,16 +217,22 @@ class BrowserAgent:
         self, max_retries=5, base_delay_s=1
     ) -> types.GenerateContentResponse:
         for attempt in range(max_retries):
+            self._cancel_token.check()
             try:
-                response = self._client.models.generate_content(
-                    model=self._model_name,
-                    contents=self._contents,
-                    config=self._generate_content_config,
-                )
+                with self._model_gate(), metrics.gemini_call(self._model_name, "browser_agent"):
+                    response = self._client.models.generate_content(
+                        model=self._model_name,
+                        contents=self._contents,
+                        config=self._generate_content_config,
+                    )
+                usage.record(response)
                 return response  # Return response on success
+            except Cancelled:
+                raise
             except Exception as e:
                 print(e)
                 if attempt < max_retries - 1:
+                    metrics.GEMINI_RETRIES.inc(model=self._model_name)
                     delay = base_delay_s * (2**attempt)
                     message = (
                         f"Generating content failed on attempt {attempt + 1}. "
@@ -216,7 +242,7 @@ class BrowserAgent:
                         message,
                         color="yellow",
                     )
-                    time.sleep(delay)
+                    self._cancel_token.sleep(delay)
                 else:
                     termcolor.cprint(
                         f"Generating content failed after {max_retries} attempts.\n",
@@ -244,7 +270,9 @@ class BrowserAgent:
                 ret.append(part.function_call)
         return ret
 
+    @tracing.traced()
     def run_one_iteration(self) -> Literal["COMPLETE", "CONTINUE"]:
+        self._cancel_token.check()
         # Generate a response from the model.
         if self._verbose:
             with console.status(
@@ -252,11 +280,15 @@ class BrowserAgent:
             ):
                 try:
                     response = self.get_model_response()
+                except Cancelled:
+                    raise
                 except Exception as e:
                     return "COMPLETE"
         else:
             try:
                 response = self.get_model_response()
+            except Cancelled:
+                raise
             except Exception as e:
                 return "COMPLETE"
 
@@ -272,6 +304,7 @@ class BrowserAgent:
             self._contents.append(candidate.content)
 
         reasoning = self.get_text(candidate)
+        self.last_reasoning = reasoning
         function_calls = self.extract_function_calls(candidate)
 
         # Retry the request in case of malformed FCs.
@@ -319,14 +352,17 @@ class BrowserAgent:
                     return "COMPLETE"
                 # Explicitly mark the safety check as acknowledged.
                 extra_fr_fields["safety_acknowledgement"] = "true"
-            if self._verbose:
-                with console.status(
-                    "Sending command to Computer...", spinner_style=None
-                ):
+            self._cancel_token.check()
+            with metrics.BROWSER_ACTION_LATENCY.time(action=function_call.name):
+                if self._verbose:
+                    with console.status(
+                        "Sending command to Computer...", spinner_style=None
+                    ):
+                        fc_result = self.handle_action(function_call)
+                else:
                     fc_result = self.handle_action(function_call)
-            else:
-                fc_result = self.handle_action(function_call)
             if isinstance(fc_result, EnvState):
+                self.current_url = fc_result.url
                 function_responses.append(
                     FunctionResponse(
                         name=function_call.name,
@@ -406,8 +442,36 @@ class BrowserAgent:
 
     def agent_loop(self):
         status = "CONTINUE"
-        while status == "CONTINUE":
-            status = self.run_one_iteration()
+        outcome = "error"
+        try:
+            while status == "CONTINUE":
+                # Out of tokens, time or steps: stop here and report how far we got
+                exhausted = usage.exhausted()
+                if exhausted:
+                    self.final_reasoning = (
+                        f"Stopped after {self.steps} steps because the {exhausted} ran out. "
+                        f"Last step: {self.last_reasoning or 'none'}"
+                    )
+                    outcome = "budget"
+                    return
+                status = self.run_one_iteration()
+                self.steps += 1
+                usage.record_step()
+                if self._on_step:
+                    self._on_step(
+                        {
+                            "step": self.steps,
+                            "url": self.current_url,
+                            "reasoning": self.last_reasoning,
+                            "status": status,
+                        }
+                    )
+            outcome = "complete"
+        except Cancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            metrics.BROWSER_STEPS.observe(self.steps, outcome=outcome)
 
     def denormalize_x(self, x: int) -> int:
         return int(x / 1000 * self._browser_computer.screen_size()[0])
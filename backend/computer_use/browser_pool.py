@@ -0,0 +1,151 @@
+"""Pool of pre-launched Chromium browsers for Computer Use tasks.
+
+Playwright's sync API is bound to the thread that started it, so every pooled
+browser lives on its own worker thread and tasks are shipped to those threads.
+Each task gets a fresh, isolated context on an already running browser (see
+PlaywrightComputer's `browser` argument), which skips the Chromium launch.
+
+Before a task the worker checks that its browser is still connected and relaunches
+it if not; browsers are also recycled after `max_tasks_per_browser` tasks to keep
+leaks in check. Tasks wait in a bounded queue; once it is full, submit() raises
+BrowserPoolFull instead of queueing more work.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from playwright.sync_api import sync_playwright
+
+from computer_use.computers.playwright.playwright import launch_browser
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolFull(Exception):
+    """Raised when the pool's wait queue is full."""
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_tasks_per_browser: Optional[int] = None,
+        max_waiting: Optional[int] = None,
+    ):
+        self.size = size or int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+        self.max_tasks_per_browser = max_tasks_per_browser or int(
+            os.environ.get("BROWSER_POOL_MAX_TASKS", "20")
+        )
+        max_waiting = max_waiting or int(os.environ.get("BROWSER_POOL_MAX_WAITING", "8"))
+        self._tasks: queue.Queue = queue.Queue(maxsize=max_waiting)
+        self._workers: list[threading.Thread] = []
+        self._busy = 0
+        self._launches = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker threads; each launches its browser right away."""
+        for i in range(self.size):
+            worker = threading.Thread(
+                target=self._worker, name=f"browser-pool-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def submit(self, fn: Callable[[Any], Any]) -> Future:
+        """Runs fn(browser) on a pooled browser and returns a Future for its result."""
+        future: Future = Future()
+        try:
+            self._tasks.put_nowait((fn, future))
+        except queue.Full:
+            raise BrowserPoolFull(
+                f"All {self.size} browsers are busy and {self._tasks.maxsize} tasks are already waiting"
+            )
+        return future
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=30)
+        self._workers = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "waiting": self._tasks.qsize(),
+                "max_waiting": self._tasks.maxsize,
+                "launches": self._launches,
+                "completed": self._completed,
+            }
+
+    def _launch(self, playwright, old_browser=None):
+        if old_browser is not None:
+            try:
+                old_browser.close()
+            except Exception:
+                pass
+        start = time.perf_counter()
+        browser = launch_browser(playwright)
+        with self._lock:
+            self._launches += 1
+        logger.info("Launched pooled browser in %.2fs", time.perf_counter() - start)
+        return browser
+
+    def _worker(self):
+        playwright = sync_playwright().start()
+        browser = None
+        tasks_on_browser = 0
+        try:
+            try:
+                browser = self._launch(playwright)
+            except Exception:
+                logger.exception("Could not pre-launch pooled browser; retrying on first task")
+            while True:
+                item = self._tasks.get()
+                if item is None:
+                    break
+                fn, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                # Health check and recycling happen between tasks, never during one.
+                if (
+                    browser is None
+                    or not browser.is_connected()
+                    or tasks_on_browser >= self.max_tasks_per_browser
+                ):
+                    try:
+                        browser = self._launch(playwright, browser)
+                    except Exception as e:
+                        browser = None
+                        future.set_exception(e)
+                        continue
+                    tasks_on_browser = 0
+
+                with self._lock:
+                    self._busy += 1
+                try:
+                    future.set_result(fn(browser))
+                except Exception as e:
+                    future.set_exception(e)
+                finally:
+                    tasks_on_browser += 1
+                    with self._lock:
+                        self._busy -= 1
+                        self._completed += 1
+        finally:
+            if browser is not None:
+                try:
+                    browser.close()
+                except Exception:
+                    pass
+            playwright.stop()
@@ -0,0 +1,44 @@
+"""Cooperative cancellation for browser tasks.
+
+A CancelToken is shared between whoever owns a task (a job, a request) and the
+code doing the work (BrowserAgent, PlaywrightComputer). The worker calls check()
+between steps and uses sleep() instead of time.sleep(), so a cancel() or an
+expired deadline stops the task within one step and the `with` blocks around it
+clean up the browser.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class Cancelled(Exception):
+    """Raised by CancelToken.check() once the token is cancelled or past its deadline."""
+
+
+class CancelToken:
+    def __init__(self, timeout_s: Optional[float] = None):
+        self._event = threading.Event()
+        self._deadline = time.monotonic() + timeout_s if timeout_s else None
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self._deadline and time.monotonic() >= self._deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """Like time.sleep, but wakes up (and raises Cancelled) as soon as the token is cancelled."""
+        if self._deadline:
+            seconds = min(seconds, max(0.0, self._deadline - time.monotonic()))
+        self._event.wait(seconds)
+        self.check()
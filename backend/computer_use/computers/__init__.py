@@ -11,9 +11,25 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import importlib
+
 from .computer import Computer, EnvState
-from .browserbase.browserbase import BrowserbaseComputer
-from .playwright.playwright import PlaywrightComputer
+
+# The concrete computers pull in Playwright (and the browserbase SDK), so they
+# are only imported when first accessed.
+_LAZY = {
+    "BrowserbaseComputer": ".browserbase.browserbase",
+    "PlaywrightComputer": ".playwright.playwright",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     "Computer",
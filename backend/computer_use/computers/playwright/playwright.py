@@ -13,13 +13,14 @@
 # limitations under the License.
 import logging
 import termcolor
-import time
 import os
 import sys
 from ..computer import (
     Computer,
     EnvState,
 )
+from ...cancellation import CancelToken
+import tracing
 import playwright.sync_api
 from playwright.sync_api import sync_playwright
 from typing import Literal
@@ -72,8 +73,32 @@ PLAYWRIGHT_KEY_MAP = {
 }
 
 
+def launch_browser(playwright: playwright.sync_api.Playwright) -> playwright.sync_api.Browser:
+    """Launches the Chromium instance used for Computer Use sessions."""
+    return playwright.chromium.launch(
+        args=[
+            "--disable-extensions",
+            "--disable-file-system",
+            "--disable-plugins",
+            "--disable-dev-shm-usage",
+            "--disable-background-networking",
+            "--disable-default-apps",
+            "--disable-sync",
+            # No '--no-sandbox' arg means the sandbox is on.
+        ],
+        headless=bool(os.environ.get("PLAYWRIGHT_HEADLESS", False)),
+    )
+
+
 class PlaywrightComputer(Computer):
-    """Connects to a local Playwright instance."""
+    """Connects to a local Playwright instance.
+
+    If `browser` is given (e.g. from a BrowserPool), it is reused and only a fresh
+    context is created and torn down; the caller owns the browser's lifetime and
+    must use it from the thread that launched it.
+
+    All waits go through `cancel_token`, so a cancelled task stops at the next one.
+    """
 
     def __init__(
         self,
@@ -81,11 +106,15 @@ class PlaywrightComputer(Computer):
         initial_url: str = "https://www.google.com",
         search_engine_url: str = "https://www.google.com",
         highlight_mouse: bool = False,
+        browser: playwright.sync_api.Browser = None,
+        cancel_token: CancelToken = None,
     ):
         self._initial_url = initial_url
         self._screen_size = screen_size
         self._search_engine_url = search_engine_url
         self._highlight_mouse = highlight_mouse
+        self._shared_browser = browser
+        self._cancel_token = cancel_token or CancelToken()
 
     def _handle_new_page(self, new_page: playwright.sync_api.Page):
         """The Computer Use model only supports a single tab at the moment.
@@ -97,22 +126,16 @@ class PlaywrightComputer(Computer):
         new_page.close()
         self._page.goto(new_url)
 
+    @tracing.traced("PlaywrightComputer.start")
     def __enter__(self):
         print("Creating session...")
-        self._playwright = sync_playwright().start()
-        self._browser = self._playwright.chromium.launch(
-            args=[
-                "--disable-extensions",
-                "--disable-file-system",
-                "--disable-plugins",
-                "--disable-dev-shm-usage",
-                "--disable-background-networking",
-                "--disable-default-apps",
-                "--disable-sync",
-                # No '--no-sandbox' arg means the sandbox is on.
-            ],
-            headless=bool(os.environ.get("PLAYWRIGHT_HEADLESS", False)),
-        )
+        if self._shared_browser is not None:
+            # Pooled browser: only this task's context and page are ours.
+            self._playwright = None
+            self._browser = self._shared_browser
+        else:
+            self._playwright = sync_playwright().start()
+            self._browser = launch_browser(self._playwright)
         self._context = self._browser.new_context(
             viewport={
                 "width": self._screen_size[0],
@@ -131,9 +154,13 @@ class PlaywrightComputer(Computer):
         )
         return self
 
+    @tracing.traced("PlaywrightComputer.stop")
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self._context:
             self._context.close()
+        if self._shared_browser is not None:
+            # The pool owns the browser and keeps it running for the next task.
+            return
         try:
             self._browser.close()
         except Exception as e:
@@ -147,21 +174,25 @@ class PlaywrightComputer(Computer):
 
         self._playwright.stop()
 
+    @tracing.traced()
     def open_web_browser(self) -> EnvState:
         return self.current_state()
 
+    @tracing.traced()
     def click_at(self, x: int, y: int):
         self.highlight_mouse(x, y)
         self._page.mouse.click(x, y)
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def hover_at(self, x: int, y: int):
         self.highlight_mouse(x, y)
         self._page.mouse.move(x, y)
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def type_text_at(
         self,
         x: int,
@@ -204,6 +235,7 @@ class PlaywrightComputer(Computer):
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def scroll_document(
         self, direction: Literal["up", "down", "left", "right"]
     ) -> EnvState:
@@ -216,6 +248,7 @@ class PlaywrightComputer(Computer):
         else:
             raise ValueError("Unsupported direction: ", direction)
 
+    @tracing.traced()
     def scroll_at(
         self,
         x: int,
@@ -245,23 +278,28 @@ class PlaywrightComputer(Computer):
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def wait_5_seconds(self) -> EnvState:
-        time.sleep(5)
+        self._cancel_token.sleep(5)
         return self.current_state()
 
+    @tracing.traced()
     def go_back(self) -> EnvState:
         self._page.go_back()
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def go_forward(self) -> EnvState:
         self._page.go_forward()
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def search(self) -> EnvState:
         return self.navigate(self._search_engine_url)
 
+    @tracing.traced()
     def navigate(self, url: str) -> EnvState:
         normalized_url = url
         if not normalized_url.startswith(("http://", "https://")):
@@ -270,6 +308,7 @@ class PlaywrightComputer(Computer):
         self._page.wait_for_load_state()
         return self.current_state()
 
+    @tracing.traced()
     def key_combination(self, keys: list[str]) -> EnvState:
         # Normalize all keys to the Playwright compatible version.
         keys = [PLAYWRIGHT_KEY_MAP.get(k.lower(), k) for k in keys]
@@ -284,6 +323,7 @@ class PlaywrightComputer(Computer):
 
         return self.current_state()
 
+    @tracing.traced()
     def drag_and_drop(
         self, x: int, y: int, destination_x: int, destination_y: int
     ) -> EnvState:
@@ -299,11 +339,12 @@ class PlaywrightComputer(Computer):
         self._page.mouse.up()
         return self.current_state()
 
+    @tracing.traced()
     def current_state(self) -> EnvState:
         self._page.wait_for_load_state()
         # Even if Playwright reports the page as loaded, it may not be so.
         # Add a manual sleep to make sure the page has finished rendering.
-        time.sleep(0.5)
+        self._cancel_token.sleep(0.5)
         screenshot_bytes = self._page.screenshot(type="png", full_page=False)
         return EnvState(screenshot=screenshot_bytes, url=self._page.url)
 
@@ -315,6 +356,7 @@ class PlaywrightComputer(Computer):
         # If unavailable, fall back to the original provided size.
         return self._screen_size
 
+    @tracing.traced()
     def highlight_mouse(self, x: int, y: int):
         if not self._highlight_mouse:
             return
@@ -344,4 +386,4 @@ class PlaywrightComputer(Computer):
     """
         )
         # Wait a bit for the user to see the cursor.
-        time.sleep(1)
+        self._cancel_token.sleep(1)
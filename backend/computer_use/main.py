@@ -16,11 +16,23 @@ import os
 
 from computer_use.agent import BrowserAgent
 from computer_use.computers import PlaywrightComputer
+import tracing
 
 
 
 
-def gemini_computer_use(query: str, initial_url: str = "http://www.google.com", model="gemini-2.5-computer-use-preview-10-2025") -> int:
+@tracing.traced()
+def gemini_computer_use(query: str, initial_url: str = "http://www.google.com", model="gemini-2.5-computer-use-preview-10-2025", on_step=None, browser=None, cancel_token=None, model_gate=None) -> dict:
+    """Runs the browser agent loop for query and returns its outcome.
+
+    on_step, if given, is called after every model turn (see BrowserAgent).
+    browser, if given, is an already launched Playwright browser (see BrowserPool);
+    the task then only gets a fresh context instead of a whole new Chromium.
+    cancel_token, if given, stops the loop within one step once cancelled; the
+    browser context is still closed on the way out.
+    model_gate, if given, returns a context manager held around each model call
+    (see scheduler.PriorityGate.automation).
+    """
 
     PLAYWRIGHT_SCREEN_SIZE = (1440, 900)
 
@@ -29,6 +41,8 @@ def gemini_computer_use(query: str, initial_url: str = "http://www.google.com",
         screen_size=PLAYWRIGHT_SCREEN_SIZE,
         initial_url=initial_url,
         highlight_mouse=False,
+        browser=browser,
+        cancel_token=cancel_token,
     )   
 
     with env as browser_computer:
@@ -36,10 +50,17 @@ def gemini_computer_use(query: str, initial_url: str = "http://www.google.com",
             browser_computer=browser_computer,
             query=query,
             model_name=model,
+            on_step=on_step,
+            cancel_token=cancel_token,
+            model_gate=model_gate,
         )
         agent.agent_loop()
 
-    return 0
+    return {
+        "final_reasoning": agent.final_reasoning,
+        "url": agent.current_url,
+        "steps": agent.steps,
+    }
 
 
 if __name__ == "__main__":
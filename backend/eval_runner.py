@@ -0,0 +1,257 @@
+"""
+Offline evaluation runner: a file of questions through RAG_Agent, many at a time.
+
+Questions come from a JSONL file, one object per line with a "question" (or
+"prompt") and optionally an "id"; any other fields (expected answer, tags, ...)
+are copied to the result. Questions without an id get one from a hash of the
+text, so the same question keeps its id across files and runs.
+
+Each question runs through RAG_Agent, bypassing the answer caches unless
+--use-cache is given, with at most --concurrency in flight and at most --rps
+started per second. Every result is appended to --out as soon as it is done:
+the answer, the model it was routed to, latency, token usage and model calls,
+or the error. Results already in --out are skipped, so an interrupted run picks
+up where it stopped (--retry-errors also reruns the ones that failed).
+
+    python eval_runner.py questions.jsonl --out results/flash.jsonl --concurrency 8 --rps 4
+    python eval_runner.py questions.jsonl --out results/lite.jsonl --model gemini-2.5-flash-lite --label lite
+    python eval_runner.py --summary results/flash.jsonl results/lite.jsonl
+    python eval_runner.py --write-questions questions.jsonl   # the warm_cache question set
+
+Settings the runner has no flag for (router, budgets, GENAI_RECORD, ...) come
+from the environment as usual; --label records which variant a file holds.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import time
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from usage import track_usage
+
+
+def question_id(question: str) -> str:
+    return hashlib.sha256(question.encode()).hexdigest()[:12]
+
+
+def read_jsonl(path: str) -> list[dict]:
+    """The objects in a JSONL file; a line cut off by an interrupted write is skipped."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def load_questions(path: str) -> list[dict]:
+    questions, seen = [], set()
+    for record in read_jsonl(path):
+        question = record.pop("question", None) or record.pop("prompt", None)
+        if not question:
+            continue
+        record["id"] = str(record.get("id") or question_id(question))
+        if record["id"] not in seen:
+            seen.add(record["id"])
+            questions.append({**record, "question": question})
+    return questions
+
+
+def latest_results(path: str) -> dict[str, dict]:
+    """id -> the last result written for it (a retried question has several)."""
+    if not os.path.exists(path):
+        return {}
+    return {result["id"]: result for result in read_jsonl(path) if "id" in result}
+
+
+class RateLimiter:
+    """Spaces out starts to at most rps per second (no limit for rps <= 0)."""
+
+    def __init__(self, rps: float):
+        self.interval = 1 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+# Models the router picked for the question in flight; the list is shared with any task the agent starts
+routed_models: ContextVar[Optional[list]] = ContextVar("routed_models", default=None)
+
+
+def record_routes(router):
+    """Wraps router.route so each question's result can say which model answered it."""
+    route = router.route
+
+    def recording_route(prompt: str):
+        decision = route(prompt)
+        models = routed_models.get()
+        if models is not None:
+            models.append(decision.model)
+        return decision
+
+    router.route = recording_route
+
+
+async def ask(agent, question: str, use_cache: bool, user_id: Optional[str]) -> str:
+    if use_cache:
+        return await agent.generate(question, user_id)
+    answer, _ = await agent.generate_uncached(question, await agent.aconfig_for(user_id), owner=user_id)
+    return answer
+
+
+async def run(
+    agent,
+    questions: Iterable[dict],
+    out_path: str,
+    concurrency: int = 4,
+    rps: float = 0.0,
+    use_cache: bool = False,
+    user_id: str = None,
+    label: str = None,
+    total: int = None,
+) -> int:
+    """Runs the questions and appends one result per question to out_path. Returns how many ran."""
+    limiter = RateLimiter(rps)
+    record_routes(agent.router)
+    pending = iter(questions)
+    done = 0
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    with open(out_path, "a+", encoding="utf-8") as out:
+        # A run killed mid-write leaves half a line; end it so the next result starts clean
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+
+        async def worker():
+            nonlocal done
+            # Workers pull from one iterator, so only `concurrency` questions are ever in flight
+            for record in pending:
+                await limiter.wait()
+                start = time.perf_counter()
+                models = []
+                routed_models.set(models)
+                with track_usage() as usage:
+                    try:
+                        answer, error = await ask(agent, record["question"], use_cache, user_id), None
+                    except Exception as e:
+                        answer, error = None, f"{type(e).__name__}: {e}"
+                result = {
+                    **record,
+                    "label": label,
+                    # None when the answer came from a cache
+                    "model": models[0] if models else None,
+                    "answer": answer,
+                    "error": error,
+                    "latency_s": round(time.perf_counter() - start, 3),
+                    **usage.to_dict(),
+                    "finished_at": time.time(),
+                }
+                # One whole line per result, flushed at once: an interruption loses at most the ones in flight
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                done += 1
+                status = f"error: {error}" if error else f"{result['total_tokens']} tokens"
+                print(f"[{done}/{total or '?'}] {result['latency_s']:>6.2f}s  {record['id']}  {status}")
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def summarize(paths: list[str]):
+    print(f"{'file':<32}{'label':<12}{'n':>6}{'errors':>8}{'p50 s':>8}{'p95 s':>8}{'mean s':>8}{'tokens/q':>10}{'calls/q':>9}")
+    for path in paths:
+        results = list(latest_results(path).values())
+        ok = [r for r in results if not r.get("error")]
+        latencies = [r["latency_s"] for r in ok]
+        labels = sorted({str(r.get("label")) for r in results if r.get("label")})
+        print(
+            f"{os.path.basename(path)[:31]:<32}{','.join(labels)[:11]:<12}{len(results):>6}{len(results) - len(ok):>8}"
+            f"{percentile(latencies, 50):>8.2f}{percentile(latencies, 95):>8.2f}"
+            f"{statistics.fmean(latencies) if latencies else 0.0:>8.2f}"
+            f"{statistics.fmean(r['total_tokens'] for r in ok) if ok else 0.0:>10.0f}"
+            f"{statistics.fmean(r['calls'] for r in ok) if ok else 0.0:>9.1f}"
+        )
+
+
+def write_questions(path: str):
+    from warm_cache import build_questions
+
+    with open(path, "w", encoding="utf-8") as f:
+        for question in build_questions():
+            f.write(json.dumps({"id": question_id(question), "question": question}) + "\n")
+
+
+async def main(args):
+    from RAG_agent import RAG_Agent
+
+    questions = load_questions(args.questions)
+    finished = latest_results(args.out)
+    todo = [
+        q for q in questions
+        if q["id"] not in finished or (args.retry_errors and finished[q["id"]].get("error"))
+    ]
+    print(f"{len(questions)} questions, {len(questions) - len(todo)} already in {args.out}, {len(todo)} to run\n")
+    if not todo:
+        return
+
+    agent = RAG_Agent()
+    if args.model:
+        agent.model = agent.router.heavy_model = args.model
+        # Light-routed questions use it too, unless a light model was set for the router
+        if not os.getenv("ROUTER_RAG_LIGHT_MODEL"):
+            agent.router.light_model = args.model
+    start = time.perf_counter()
+    done = await run(agent, todo, args.out, args.concurrency, args.rps, args.use_cache, args.user_id, args.label, len(todo))
+    print(f"\n{done} questions in {time.perf_counter() - start:.1f}s\n")
+    summarize([args.out])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", nargs="?", help="JSONL file of questions")
+    parser.add_argument("--out", default="eval_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rps", type=float, default=0.0, help="at most this many questions started per second (0: no limit)")
+    parser.add_argument("--model", help="override RAG_Agent's model (on both routes unless ROUTER_RAG_LIGHT_MODEL is set)")
+    parser.add_argument("--label", help="recorded with every result, to tell variants apart")
+    parser.add_argument("--user-id", help="answer with this user's profile")
+    parser.add_argument("--use-cache", action="store_true", help="go through the answer caches like the server does")
+    parser.add_argument("--retry-errors", action="store_true", help="also rerun questions whose last result was an error")
+    parser.add_argument("--summary", nargs="+", metavar="RESULTS", help="only summarize result files, side by side")
+    parser.add_argument("--write-questions", metavar="PATH", help="write the warm_cache question set as JSONL and exit")
+    args = parser.parse_args()
+
+    if args.summary:
+        summarize(args.summary)
+    elif args.write_questions:
+        write_questions(args.write_questions)
+    elif not args.questions:
+        parser.error("a questions file is required")
+    else:
+        try:
+            asyncio.run(main(args))
+        except KeyboardInterrupt:
+            print(f"\nInterrupted; results so far are in {args.out}, run again to resume")
@@ -0,0 +1,179 @@
+"""
+Local stand-in for genai.Client, for benchmarks that must not spend real quota.
+
+Usage:
+    from fake_genai import FakeClient
+    agent.client = FakeClient(latency_s=0.5)
+
+Both the sync surface (client.models) and the async one (client.aio.models) are
+provided. The sync calls sleep with time.sleep, the async ones with asyncio.sleep,
+so they block (or not) exactly like the real SDK transports do.
+
+Beyond a canned text answer the fake can behave more like the real model:
+
+    chunks          streamed answers arrive in this many chunks (default: one per
+                    word), spread evenly over latency_s
+    tool_call_rate  share of calls offered function tools that answer with a call
+                    to tool_name instead of text; the follow-up call (the one that
+                    carries the function response) always answers with text
+    usage           attach usage_metadata (about 4 characters per token), so token
+                    accounting and budgets see traffic
+    seed            for the random tool-call decisions, so runs are repeatable
+"""
+import asyncio
+import random
+import time
+
+from google.genai import types
+
+
+def fake_response(text: str = None, function_call: types.FunctionCall = None, usage: types.GenerateContentResponseUsageMetadata = None) -> types.GenerateContentResponse:
+    part = types.Part(function_call=function_call) if function_call else types.Part(text=text)
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[part]),
+                finish_reason=types.FinishReason.STOP,
+            )
+        ],
+        usage_metadata=usage,
+    )
+
+
+def count_tokens(contents) -> int:
+    """Rough prompt size of whatever the caller passed as contents (~4 characters per token)."""
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, types.Content):
+        return sum(len(part.text or "") for part in (contents.parts or [])) // 4 + 1
+    if isinstance(contents, dict):
+        return sum(len(part.get("text") or "") for part in contents.get("parts", [])) // 4 + 1
+    return sum(count_tokens(content) for content in contents)
+
+
+def offers_tool(config: types.GenerateContentConfig, name: str) -> bool:
+    if config is None or not config.tools:
+        return False
+    mode = config.tool_config and config.tool_config.function_calling_config and config.tool_config.function_calling_config.mode
+    if mode == types.FunctionCallingConfigMode.NONE:
+        return False
+    return any(decl.name == name for tool in config.tools for decl in (tool.function_declarations or []))
+
+
+def answers_function(contents) -> bool:
+    """True if the last turn carries function responses (so the model should answer in text)."""
+    last = contents[-1] if isinstance(contents, list) and contents else None
+    parts = last.parts if isinstance(last, types.Content) else []
+    return any(part.function_response for part in (parts or []))
+
+
+class FakeModels:
+    def __init__(
+        self,
+        latency_s: float,
+        text: str,
+        chunks: int = None,
+        tool_call_rate: float = 0.0,
+        tool_name: str = "start_browser",
+        usage: bool = False,
+        seed: int = 0,
+    ):
+        self.latency_s = latency_s
+        self.text = text
+        self.chunks = chunks
+        self.tool_call_rate = tool_call_rate
+        self.tool_name = tool_name
+        self.usage = usage
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.tool_calls = 0
+
+    def function_call(self, contents, config) -> types.FunctionCall:
+        """A call to tool_name, or None if this call should answer in text."""
+        if not self.tool_call_rate or answers_function(contents) or not offers_tool(config, self.tool_name):
+            return None
+        if self.random.random() >= self.tool_call_rate:
+            return None
+        self.tool_calls += 1
+        return types.FunctionCall(id=f"fake-{self.tool_calls}", name=self.tool_name, args={"query": self.text})
+
+    def usage_metadata(self, contents, output: str) -> types.GenerateContentResponseUsageMetadata:
+        if not self.usage:
+            return None
+        prompt, candidates = count_tokens(contents), len(output) // 4 + 1
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt, candidates_token_count=candidates, total_token_count=prompt + candidates
+        )
+
+    def pieces(self) -> list[str]:
+        words = self.text.split(" ")
+        n = min(self.chunks or len(words), len(words))
+        # n roughly equal runs of words, keeping the spaces between them
+        bounds = [round(i * len(words) / n) for i in range(n + 1)]
+        return [(" " if i else "") + " ".join(words[bounds[i]:bounds[i + 1]]) for i in range(n)]
+
+    def respond(self, contents, config) -> types.GenerateContentResponse:
+        self.calls += 1
+        fn = self.function_call(contents, config)
+        if fn is not None:
+            return fake_response(function_call=fn, usage=self.usage_metadata(contents, ""))
+        return fake_response(self.text, usage=self.usage_metadata(contents, self.text))
+
+    def stream(self, contents, config) -> list[types.GenerateContentResponse]:
+        """The chunks of one streamed answer; the last carries the usage totals."""
+        self.calls += 1
+        fn = self.function_call(contents, config)
+        if fn is not None:
+            return [fake_response(function_call=fn, usage=self.usage_metadata(contents, ""))]
+        pieces = self.pieces()
+        usage = self.usage_metadata(contents, self.text)
+        return [fake_response(piece, usage=usage if i == len(pieces) - 1 else None) for i, piece in enumerate(pieces)]
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.latency_s)
+        return self.respond(contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        chunks = self.stream(contents, config)
+        for chunk in chunks:
+            time.sleep(self.latency_s / len(chunks))
+            yield chunk
+
+
+class FakeAsyncModels:
+    def __init__(self, models: FakeModels):
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self._models.latency_s)
+        return self._models.respond(contents, config)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        chunks = self._models.stream(contents, config)
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(self._models.latency_s / len(chunks))
+                yield chunk
+
+        return stream()
+
+
+class FakeAio:
+    def __init__(self, models: FakeModels):
+        self.models = FakeAsyncModels(models)
+
+
+class FakeClient:
+    def __init__(
+        self,
+        latency_s: float = 0.5,
+        text: str = "This is a canned answer from the fake Gemini client.",
+        chunks: int = None,
+        tool_call_rate: float = 0.0,
+        tool_name: str = "start_browser",
+        usage: bool = False,
+        seed: int = 0,
+    ):
+        self.models = FakeModels(latency_s, text, chunks, tool_call_rate, tool_name, usage, seed)
+        self.aio = FakeAio(self.models)
@@ -0,0 +1,361 @@
+"""
+Record and replay of Gemini calls, for repeatable profiling and regression runs.
+
+Every agent builds its client through wrap(), which is a no-op unless
+GENAI_RECORD is set:
+
+    GENAI_RECORD=record   calls go to Gemini as usual, and each request/response
+                          pair is saved to GENAI_RECORD_DIR (default recordings/)
+    GENAI_RECORD=replay   calls are answered from the recording, with no network;
+                          GENAI_REPLAY_LATENCY=original sleeps as long as the
+                          recorded call took (streamed chunks at their recorded
+                          offsets), zero (default) answers at once
+
+A call is keyed by a hash of the model, the contents and the config, so a replay
+finds the answer as long as the pipeline sends the same request. If one request
+was recorded several times (a browser loop asking again), replays serve the
+recordings in order and then keep repeating the last. A request that was never
+recorded raises ReplayMiss, or with GENAI_REPLAY_MISS=live goes to Gemini.
+
+On disk:
+
+    calls.jsonl         one line per call: key, model, request, response chunks
+                        and their time offsets
+    blobs/<sha256>      inline data (screenshots); the calls refer to it by hash,
+                        so a screenshot resent with every later turn is stored once
+
+    python genai_recorder.py [dir]      summary of a recording
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from google.genai import types
+from pydantic import BaseModel
+
+import metrics
+
+MODES = ("off", "record", "replay")
+
+
+class ReplayMiss(KeyError):
+    pass
+
+
+def dump(value: Any) -> Any:
+    """Plain data (dicts, lists, str, bytes, numbers) for SDK objects and lists of them."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="python", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [dump(item) for item in value]
+    return value
+
+
+def pack(value: Any, blobs: dict[str, bytes]) -> Any:
+    """JSON-compatible copy of dump()ed data, with bytes replaced by {"$blob": sha256}
+    references; the bytes are collected into blobs."""
+    if isinstance(value, bytes):
+        digest = hashlib.sha256(value).hexdigest()
+        blobs[digest] = value
+        return {"$blob": digest}
+    if isinstance(value, dict):
+        return {str(key): pack(item, blobs) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [pack(item, blobs) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # Enums and the like
+    return str(value)
+
+
+def request_key(model: str, contents: Any, config: Any, blobs: dict[str, bytes]) -> tuple[str, dict]:
+    """(key, packed request) for one call."""
+    request = pack({"model": model, "contents": dump(contents), "config": dump(config)}, blobs)
+    key = hashlib.sha256(json.dumps(request, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+    return key, request
+
+
+class Recording:
+    """The calls.jsonl + blobs/ store of one directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._calls: Optional[dict[str, list[dict]]] = None
+        self._served: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Caller holds the lock
+        if self._calls is not None:
+            return
+        self._calls = defaultdict(list)
+        try:
+            with open(os.path.join(self.path, "calls.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        call = json.loads(line)
+                        self._calls[call["key"]].append(call)
+        except FileNotFoundError:
+            pass
+
+    def blob(self, digest: str) -> bytes:
+        with open(os.path.join(self.path, "blobs", digest), "rb") as f:
+            return f.read()
+
+    def unpack(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if set(value) == {"$blob"}:
+                return self.blob(value["$blob"])
+            return {key: self.unpack(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.unpack(item) for item in value]
+        return value
+
+    def add(self, key: str, request: dict, chunks: list, offsets: list[float], stream: bool, blobs: dict[str, bytes]):
+        packed_chunks = [pack(dump(chunk), blobs) for chunk in chunks]
+        os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+        for digest, data in blobs.items():
+            path = os.path.join(self.path, "blobs", digest)
+            if not os.path.exists(path):
+                # Written aside and renamed, so a concurrent reader never sees half a blob
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+        call = {
+            "key": key,
+            "model": request["model"],
+            "stream": stream,
+            "request": request,
+            "chunks": packed_chunks,
+            "offsets": [round(offset, 4) for offset in offsets],
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(call, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._load()
+            with open(os.path.join(self.path, "calls.jsonl"), "a", encoding="utf-8") as f:
+                f.write(line)
+            self._calls[key].append(call)
+
+    def take(self, key: str, stream: bool) -> Optional[dict]:
+        """The next recorded call for key made the same way (streamed or not), or None."""
+        with self._lock:
+            self._load()
+            # The same request streamed and not streamed records different chunks
+            calls = [call for call in self._calls.get(key, ()) if call["stream"] == stream]
+            if not calls:
+                return None
+            call = calls[min(self._served[key, stream], len(calls) - 1)]
+            self._served[key, stream] += 1
+            return call
+
+    def responses(self, call: dict) -> list[types.GenerateContentResponse]:
+        return [types.GenerateContentResponse.model_validate(self.unpack(chunk)) for chunk in call["chunks"]]
+
+
+class Recorder:
+    def __init__(self, mode: str = None, path: str = None, replay_latency: str = None, on_miss: str = None):
+        self.mode = (mode or os.getenv("GENAI_RECORD", "off")).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown GENAI_RECORD {self.mode!r} (expected one of {', '.join(MODES)})")
+        self.recording = Recording(path or os.getenv("GENAI_RECORD_DIR", "recordings"))
+        self.replay_latency = (replay_latency or os.getenv("GENAI_REPLAY_LATENCY", "zero")).lower()
+        self.on_miss = (on_miss or os.getenv("GENAI_REPLAY_MISS", "error")).lower()
+
+    def lookup(self, model: str, contents: Any, config: Any, stream: bool) -> tuple[str, dict, dict, Optional[dict]]:
+        """(key, request, blobs, recorded call or None) for a call about to be made."""
+        blobs: dict[str, bytes] = {}
+        key, request = request_key(model, contents, config, blobs)
+        call = self.recording.take(key, stream) if self.mode == "replay" else None
+        if self.mode == "replay":
+            metrics.RECORDED_CALLS.inc(outcome="replayed" if call else "missed")
+            if call is None and self.on_miss != "live":
+                raise ReplayMiss(f"No recorded {'stream' if stream else 'call'} to {model} for request {key[:12]}")
+        return key, request, blobs, call
+
+    def save(self, key: str, request: dict, blobs: dict, chunks: list, offsets: list[float], stream: bool):
+        self.recording.add(key, request, chunks, offsets, stream, blobs)
+        metrics.RECORDED_CALLS.inc(outcome="recorded")
+
+    def delays(self, call: dict) -> list[float]:
+        """How long to wait before each recorded chunk."""
+        if self.replay_latency != "original":
+            return [0.0] * len(call["chunks"])
+        offsets = call["offsets"]
+        return [offset - (offsets[i - 1] if i else 0.0) for i, offset in enumerate(offsets)]
+
+
+class RecordingModels:
+    def __init__(self, models, recorder: Recorder):
+        self._models = models
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        key, request, blobs, call = self._recorder.lookup(model, contents, config, stream=False)
+        if call is not None:
+            for delay in self._recorder.delays(call):
+                time.sleep(delay)
+            return self._recorder.recording.responses(call)[-1]
+
+        start = time.perf_counter()
+        response = self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        if self._recorder.mode == "record":
+            self._recorder.save(key, request, blobs, [response], [time.perf_counter() - start], stream=False)
+        return response
+
+    def generate_content_stream(self, model, contents, config=None, **kwargs):
+        key, request, blobs, call = self._recorder.lookup(model, contents, config, stream=True)
+        if call is not None:
+            for delay, chunk in zip(self._recorder.delays(call), self._recorder.recording.responses(call)):
+                time.sleep(delay)
+                yield chunk
+            return
+
+        start = time.perf_counter()
+        chunks, offsets = [], []
+        for chunk in self._models.generate_content_stream(model=model, contents=contents, config=config, **kwargs):
+            chunks.append(chunk)
+            offsets.append(time.perf_counter() - start)
+            yield chunk
+        # Only streams read to the end are recorded
+        if self._recorder.mode == "record":
+            self._recorder.save(key, request, blobs, chunks, offsets, stream=True)
+
+
+class RecordingAsyncModels:
+    def __init__(self, models, recorder: Recorder):
+        self._models = models
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+    async def generate_content(self, model, contents, config=None, **kwargs):
+        key, request, blobs, call = self._recorder.lookup(model, contents, config, stream=False)
+        if call is not None:
+            for delay in self._recorder.delays(call):
+                await asyncio.sleep(delay)
+            return self._recorder.recording.responses(call)[-1]
+
+        start = time.perf_counter()
+        response = await self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        if self._recorder.mode == "record":
+            self._recorder.save(key, request, blobs, [response], [time.perf_counter() - start], stream=False)
+        return response
+
+    async def generate_content_stream(self, model, contents, config=None, **kwargs):
+        key, request, blobs, call = self._recorder.lookup(model, contents, config, stream=True)
+        recorder = self._recorder
+        if call is not None:
+
+            async def replay():
+                for delay, chunk in zip(recorder.delays(call), recorder.recording.responses(call)):
+                    await asyncio.sleep(delay)
+                    yield chunk
+
+            return replay()
+
+        start = time.perf_counter()
+        stream = await self._models.generate_content_stream(model=model, contents=contents, config=config, **kwargs)
+
+        async def record():
+            chunks, offsets = [], []
+            async for chunk in stream:
+                chunks.append(chunk)
+                offsets.append(time.perf_counter() - start)
+                yield chunk
+            if recorder.mode == "record":
+                recorder.save(key, request, blobs, chunks, offsets, stream=True)
+
+        return record()
+
+
+class RecordingAio:
+    def __init__(self, aio, recorder: Recorder):
+        self._aio = aio
+        self.models = RecordingAsyncModels(aio.models, recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._aio, name)
+
+
+class RecordingClient:
+    """A genai.Client whose generate_content calls are recorded or replayed;
+    everything else goes to the wrapped client."""
+
+    def __init__(self, client, recorder: Recorder):
+        self._client = client
+        self.recorder = recorder
+        self.models = RecordingModels(client.models, recorder)
+        self.aio = RecordingAio(client.aio, recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_recorder: Optional[Recorder] = None
+_recorder_lock = threading.Lock()
+
+
+def recorder() -> Recorder:
+    """The process-wide recorder, configured from the environment on first use."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = Recorder()
+        return _recorder
+
+
+def wrap(client):
+    """client, recording or replaying its calls if GENAI_RECORD says so."""
+    active = recorder()
+    if active.mode == "off":
+        return client
+    return RecordingClient(client, active)
+
+
+def summarize(path: str):
+    recording = Recording(path)
+    with open(os.path.join(path, "calls.jsonl"), encoding="utf-8") as f:
+        calls = [json.loads(line) for line in f if line.strip()]
+    blob_dir = os.path.join(path, "blobs")
+    blobs = os.listdir(blob_dir) if os.path.isdir(blob_dir) else []
+    refs = Counter()
+
+    def count_refs(value):
+        if isinstance(value, dict):
+            if set(value) == {"$blob"}:
+                refs[value["$blob"]] += 1
+            for item in value.values():
+                count_refs(item)
+        elif isinstance(value, list):
+            for item in value:
+                count_refs(item)
+
+    for call in calls:
+        count_refs(call["request"])
+    blob_bytes = sum(os.path.getsize(os.path.join(blob_dir, name)) for name in blobs)
+    referenced = sum(os.path.getsize(os.path.join(blob_dir, digest)) * n for digest, n in refs.items() if digest in blobs)
+
+    print(f"{recording.path}: {len(calls)} calls, {len({call['key'] for call in calls})} distinct requests")
+    for model, n in Counter(call["model"] for call in calls).most_common():
+        seconds = sum(call["offsets"][-1] for call in calls if call["model"] == model and call["offsets"])
+        print(f"  {model:<45} {n:>6} calls {seconds:>9.1f}s recorded model time")
+    print(f"  calls.jsonl {os.path.getsize(os.path.join(path, 'calls.jsonl')) / 2**20:.1f} MB")
+    print(f"  blobs       {len(blobs)} files, {blob_bytes / 2**20:.1f} MB stored for {referenced / 2**20:.1f} MB referenced")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.getenv("GENAI_RECORD_DIR", "recordings"))
+    summarize(parser.parse_args().path)
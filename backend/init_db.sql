@@ -5,7 +5,15 @@ CREATE TABLE IF NOT EXISTS users (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Profile details the agent fills forms with (see backend/profiles.py).
+-- profile_updated_at is the profile's version: bump it on every change.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS first_name VARCHAR(255);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_name VARCHAR(255);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS phone VARCHAR(64);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS discord VARCHAR(255);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
 -- Create a test user (password is 'testpassword')
-INSERT INTO users (email, password) VALUES 
-    ('test@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewKxcQykd/4eO8V2')
+INSERT INTO users (email, password, first_name, last_name, phone) VALUES 
+    ('test@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewKxcQykd/4eO8V2', 'Test', 'User', '123-456-7890')
 ON CONFLICT (email) DO NOTHING;
\ No newline at end of file
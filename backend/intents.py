@@ -0,0 +1,54 @@
+"""
+Cheap local checks on what a prompt is asking for.
+
+These run before any model call, so they are plain regexes rather than a classifier
+(router.py can add a learned one on top).
+"""
+import re
+
+# Prompts that ask the agent to *do* something on a website; these end up as a
+# start_browser tool call and must never be answered from a cache.
+BROWSER_TASK_PATTERN = re.compile(
+    r"\b(fill( out| in)?|apply|sign (me )?up|signup|register|enroll|book|reserve|schedule|submit|"
+    r"rsvp|log ?in|open (the |a )?(browser|website|page|link)|go to|navigate|click|complete (the|my) form)\b",
+    re.IGNORECASE,
+)
+
+
+def looks_like_browser_task(prompt: str) -> bool:
+    return bool(BROWSER_TASK_PATTERN.search(prompt))
+
+
+# Greetings, thanks and other turns that need no retrieval or reasoning at all
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(hi|hey|hello|yo|sup|good (morning|afternoon|evening)|thanks?( you)?|thx|ty|ok(ay)?|cool|great|"
+    r"bye|goodbye|see you|how are you|who are you|what can you do)\b[\s!.?,]*\w{0,12}[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+# Single-fact questions: a phone number, an address, opening hours, a deadline...
+LOOKUP_PATTERN = re.compile(
+    r"\b(phone( number)?|number|address|email|hours|open|located|location|where is|website|link|url|"
+    r"deadline|due date|when (is|does|do)|contact|office|fax|cost of|price of)\b",
+    re.IGNORECASE,
+)
+
+# Asks for comparison, planning or calculation, which benefit from thinking
+REASONING_PATTERN = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|better|best|should i|which (one|plan|option)|plan for|strategy|"
+    r"calculate|how much (can|will|would|should)|pros and cons|explain why|why (is|does|do|should)|"
+    r"eligib\w*|qualif\w*|step[- ]by[- ]step|budget)\b",
+    re.IGNORECASE,
+)
+
+
+def looks_like_small_talk(prompt: str) -> bool:
+    return bool(SMALL_TALK_PATTERN.match(prompt))
+
+
+def looks_like_lookup(prompt: str) -> bool:
+    return bool(LOOKUP_PATTERN.search(prompt)) and not REASONING_PATTERN.search(prompt)
+
+
+def needs_reasoning(prompt: str) -> bool:
+    return bool(REASONING_PATTERN.search(prompt))
@@ -0,0 +1,37 @@
+"""
+The pages KnightSource publishes, by category.
+
+update_links_2.py checks these links for freshness, and url_index.py uses them
+(with the buttonLink of every subcategory in frontend/content/categories) to
+start browser tasks on the right page instead of a search engine.
+"""
+from typing import Dict, List
+
+KNIGHT_SOURCE_URLS: Dict[str, List[str]] = {
+    "Conference Registration and Travel at UCF": [
+        "https://studentgovernment.ucf.edu/wp-content/uploads/sites/4/2024/10/CRT-Spending-Policy-24-25-Title-VIII-Appendix-A.pdf",
+        "https://knightconnect.campuslabs.com/engage/submitter/form/start/636439",
+        "https://knightconnect.campuslabs.com/engage/submitter/form/start/636440",
+        "https://webcourses.ucf.edu/enroll/4FCC68",
+    ],
+    "A2O Scholarships at UCF": ["https://ucf.academicworks.com"],
+    "Dental care at UCF": ["https://studenthealth.ucf.edu/services/dental/"],
+    "Legal DUI at UCF": ["http://sls.sdes.ucf.edu/"],
+    "Lawyer": ["https://sls.sswb.ucf.edu/info/"],
+    "Outdoor Adventure Challenge Course at UCF": [
+        "https://ucfrwc.org/booking/54e23deb-011a-4743-94df-b986b042dab1",
+        "https://rwc.sswb.ucf.edu/programs/outdoor-adventure/challenge-course/",
+    ],
+    "Reservations at Recreation and Wellness Center": [
+        "http://ucf.qualtrics.com/jfe/form/SV_5uq5qcKL9OIWd49"
+    ],
+    "Sign up for intramural sports at UCF": [
+        "https://imleagues.com/spa/intramural/136f2fd71bae48bc8ee2f37e418505d9/home"
+    ],
+    "Reserve Outdoor Equipment at the Outdoor Adventure": [
+        "https://ucf.qualtrics.com/jfe/form/SV_ewAQOlYlr2Xg1A9",
+        "https://rwc.sswb.ucf.edu/wp-content/uploads/sites/32/2020/02/OAC-Equipment-Rental-Fees-revised-06.2019.pdf",
+        "https://rwc.sswb.ucf.edu/facilities/outdoor-adventure-center/",
+    ],
+    "Ticket Center at UCF": ["https://ticketcenter.sdes.ucf.edu/"],
+}
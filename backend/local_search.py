@@ -0,0 +1,289 @@
+"""
+Local BM25 retrieval over our own documents, with no network.
+
+Passages come from:
+
+- research/*.pdf, page by page (needs pypdf; without it the PDFs are skipped,
+  with a warning)
+- frontend/notes/**/*.txt, section by section ("**Heading:**" blocks)
+- frontend/content/categories/*.json, one per subcategory
+
+and are cut into windows of PASSAGE_WORDS words. Text is normalized like the
+semantic cache's prompts (lowercase, stopwords dropped, plurals folded).
+
+The inverted index keeps, per term, its document ids as gaps from the previous
+id and the term frequencies, in typed arrays (array('I') / array('H')): a few
+bytes per posting rather than a Python object each. A query walks only the
+postings of its own terms and scores with BM25 (k1=1.2, b=0.75), which takes
+well under a millisecond to a few milliseconds for this corpus.
+
+The index is built on first use and rebuilt when a source file is added,
+removed or modified (checked at most every LOCAL_SEARCH_CHECK_S seconds). Text
+extracted from PDFs is cached in LOCAL_SEARCH_CACHE, keyed by file size and
+mtime, since extraction is by far the slowest part of a build. A rebuild swaps
+in the new index in a single assignment, so searches running meanwhile finish
+on the old one.
+
+    python local_search.py "how much does the dental plan cost"
+    python local_search.py --stats
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import metrics
+from semantic_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PASSAGE_WORDS = 120
+# Consecutive windows share this many words, so an answer isn't cut in half
+PASSAGE_OVERLAP = 20
+K1 = 1.2
+B = 0.75
+HEADING = re.compile(r"^\*\*(.+?):?\*\*:?\s*$", re.MULTILINE)
+
+
+@dataclass
+class Passage:
+    text: str
+    source: str  # path relative to the repo root
+    title: str
+    page: Optional[int] = None
+
+    def citation(self) -> str:
+        return f"{self.source}, page {self.page}" if self.page else self.source
+
+
+def windows(text: str) -> list[str]:
+    words = text.split()
+    if len(words) <= PASSAGE_WORDS:
+        return [" ".join(words)] if words else []
+    step = PASSAGE_WORDS - PASSAGE_OVERLAP
+    return [" ".join(words[i:i + PASSAGE_WORDS]) for i in range(0, len(words) - PASSAGE_OVERLAP, step)]
+
+
+def pdf_pages(path: str) -> list[str]:
+    import pypdf
+
+    # pypdf warns about every font it can't fully decode; the text is still usable
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+    return [page.extract_text() or "" for page in pypdf.PdfReader(path).pages]
+
+
+def note_sections(text: str) -> tuple[str, list[tuple[str, str]]]:
+    """(subcategory name, [(heading, body)]) of a note file."""
+    parts = HEADING.split(text)
+    # parts = [preamble, heading, body, heading, body, ...]
+    sections = [(parts[i].strip(), parts[i + 1].strip()) for i in range(1, len(parts) - 1, 2)]
+    name = next((body.splitlines()[0] for heading, body in sections if heading.lower() == "subcategory name" and body), "")
+    return name, [(heading, body) for heading, body in sections if heading.lower() != "subcategory name"]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """One build of the index; never changed once made, only replaced."""
+    passages: list[Passage]
+    # term -> (doc id gaps, term frequencies)
+    postings: dict[str, tuple[array, array]]
+    lengths: array
+    avg_length: float
+
+
+class LocalIndex:
+    def __init__(self, root_dir: str = ROOT_DIR, cache_path: str = None, check_s: float = None, top_k: int = None):
+        self.root_dir = root_dir
+        self.top_k = top_k or int(os.getenv("LOCAL_SEARCH_TOP_K", "4"))
+        self.cache_path = cache_path or os.getenv("LOCAL_SEARCH_CACHE", "local_search_cache.json")
+        self.check_s = check_s if check_s is not None else float(os.getenv("LOCAL_SEARCH_CHECK_S", "30"))
+        self._snapshot = _Snapshot([], {}, array("I"), 0.0)
+        self.skipped: list[str] = []
+        self.build_s = 0.0
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sources(self) -> list[str]:
+        patterns = [
+            os.path.join("research", "*.pdf"),
+            os.path.join("frontend", "notes", "**", "*.txt"),
+            os.path.join("frontend", "content", "categories", "*.json"),
+        ]
+        return sorted(
+            path for pattern in patterns for path in glob.glob(os.path.join(self.root_dir, pattern), recursive=True)
+        )
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+
+    def _load_pdf_cache(self) -> dict:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read(self, path: str, pdf_cache: dict) -> list[Passage]:
+        source = self._relative(path)
+        if path.endswith(".pdf"):
+            stat = os.stat(path)
+            cached = pdf_cache.get(source)
+            if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+                pages = cached["pages"]
+            else:
+                pages = pdf_pages(path)
+                pdf_cache[source] = {"size": stat.st_size, "mtime": stat.st_mtime, "pages": pages}
+            title = os.path.splitext(os.path.basename(path))[0].replace("-", " ").replace("_", " ")
+            return [Passage(text, source, title, i + 1) for i, page in enumerate(pages) for text in windows(page)]
+
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+        if path.endswith(".json"):
+            category = json.loads(raw)
+            return [
+                Passage(text, source, sub.get("name", ""))
+                for sub in category.get("subcategories", [])
+                for text in windows(f"{sub.get('name', '')}. {sub.get('description_md', '')}")
+            ]
+        name, sections = note_sections(raw)
+        # Each passage names its subcategory, so "cost" in a notes section still ties to the topic
+        return [
+            Passage(text, source, name)
+            for heading, body in sections
+            for text in windows(f"{name} - {heading}: {body}")
+        ]
+
+    def _build(self, paths: list[str]):
+        # Caller holds the lock
+        start = time.perf_counter()
+        pdf_cache = self._load_pdf_cache()
+        cached_before = {source: entry["mtime"] for source, entry in pdf_cache.items()}
+        passages, skipped = [], []
+        no_pypdf = 0
+        for path in paths:
+            try:
+                passages.extend(self._read(path, pdf_cache))
+            except ImportError:
+                no_pypdf += 1
+                skipped.append(f"{self._relative(path)} (pypdf not installed)")
+            except Exception as e:
+                skipped.append(f"{self._relative(path)} ({type(e).__name__}: {e})")
+        if no_pypdf:
+            logger.warning("pypdf is not installed: %d research PDFs are left out of local search (pip install pypdf)", no_pypdf)
+        if {source: entry["mtime"] for source, entry in pdf_cache.items()} != cached_before:
+            try:
+                with open(self.cache_path, "w", encoding="utf-8") as f:
+                    json.dump(pdf_cache, f)
+            except OSError:
+                pass
+
+        postings: dict[str, tuple[array, array]] = {}
+        last_doc: dict[str, int] = {}
+        lengths = array("I")
+        for doc_id, passage in enumerate(passages):
+            # The title counts as part of the passage, so a match on the topic name ranks it
+            terms = Counter(normalize(f"{passage.title} {passage.text}"))
+            lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                if term not in postings:
+                    postings[term] = (array("I"), array("H"))
+                gaps, tfs = postings[term]
+                gaps.append(doc_id - last_doc.get(term, 0))
+                tfs.append(min(tf, 65535))
+                last_doc[term] = doc_id
+
+        self._snapshot = _Snapshot(passages, postings, lengths, sum(lengths) / len(lengths) if lengths else 0.0)
+        self.skipped = skipped
+        self.build_s = time.perf_counter() - start
+
+    def refresh(self):
+        """Rebuilds the index if a source changed since it was built."""
+        with self._lock:
+            now = time.monotonic()
+            if self._fingerprint is not None and now - self._checked_at < self.check_s:
+                return
+            self._checked_at = now
+            paths = self._sources()
+            fingerprint = tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in paths)
+            if fingerprint != self._fingerprint:
+                self._build(paths)
+                self._fingerprint = fingerprint
+
+    def search(self, query: str, k: int = None) -> list[tuple[float, Passage]]:
+        self.refresh()
+        # Read once: a rebuild meanwhile must not mix its postings with the old passages
+        snapshot = self._snapshot
+        k = k or self.top_k
+        start = time.perf_counter()
+        n = len(snapshot.passages)
+        scores: dict[int, float] = {}
+        for term in set(normalize(query)):
+            posting = snapshot.postings.get(term)
+            if posting is None:
+                continue
+            gaps, tfs = posting
+            idf = math.log(1 + (n - len(gaps) + 0.5) / (len(gaps) + 0.5))
+            doc_id = 0
+            for gap, tf in zip(gaps, tfs):
+                doc_id += gap
+                norm = K1 * (1 - B + B * snapshot.lengths[doc_id] / snapshot.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        metrics.LOCAL_SEARCH_LATENCY.observe(time.perf_counter() - start)
+        return [(score, snapshot.passages[doc_id]) for doc_id, score in best]
+
+    def stats(self) -> dict:
+        self.refresh()
+        snapshot = self._snapshot
+        posting_bytes = sum(g.itemsize * len(g) + t.itemsize * len(t) for g, t in snapshot.postings.values())
+        return {
+            "passages": len(snapshot.passages),
+            "sources": len({p.source for p in snapshot.passages}),
+            "terms": len(snapshot.postings),
+            "postings": sum(len(g) for g, _ in snapshot.postings.values()),
+            "posting_kb": round(posting_bytes / 1024, 1),
+            "build_s": round(self.build_s, 3),
+            "skipped": self.skipped,
+        }
+
+
+index = LocalIndex()
+
+
+def context(query: str, k: int = None) -> str:
+    """The top passages for query, formatted to go in front of a question ("" if none match)."""
+    hits = index.search(query, k)
+    if not hits:
+        return ""
+    excerpts = "\n\n".join(f"[{i}] ({p.citation()}) {p.text}" for i, (_, p) in enumerate(hits, 1))
+    return f"Excerpts from UCF documents that may help answer the question:\n\n{excerpts}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--stats", action="store_true", help="print index size and build time")
+    args = parser.parse_args()
+
+    if args.stats or not args.query:
+        print(json.dumps(index.stats(), indent=2))
+    else:
+        index.refresh()
+        start = time.perf_counter()
+        hits = index.search(args.query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for score, passage in hits:
+            print(f"{score:6.2f}  {passage.citation()}  [{passage.title}]\n        {passage.text[:160]}...\n")
+        print(f"{len(hits)} results in {elapsed_ms:.2f} ms")
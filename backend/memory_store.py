@@ -0,0 +1,110 @@
+"""
+Session-keyed conversation memory for base_agent.Agent.
+
+Each session keeps its turns as structured types.Content and stays under a token
+budget: when it overflows, the oldest user/model pairs are popped (and can be
+rolled into a running summary by the caller). Sessions live in the state backend
+(see state.py), so every server worker sees the same conversation; the least
+recently used ones are dropped past MEMORY_MAX_SESSIONS and idle ones expire, so
+memory use is bounded no matter how long the server runs.
+"""
+import os
+from dataclasses import dataclass, field
+
+from google.genai import types
+
+import state
+
+
+def estimate_tokens(content: types.Content) -> int:
+    """Cheap local estimate (~4 characters per token); avoids a count_tokens round-trip."""
+    chars = sum(len(part.text or "") for part in (content.parts or []))
+    return chars // 4 + 1
+
+
+@dataclass
+class Session:
+    turns: list[types.Content] = field(default_factory=list)
+    summary: str = ""
+    tokens: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Session":
+        return cls(
+            turns=[types.Content.model_validate(turn) for turn in data["turns"]],
+            summary=data["summary"],
+            tokens=data["tokens"],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "turns": [turn.model_dump(mode="json", exclude_none=True) for turn in self.turns],
+            "summary": self.summary,
+            "tokens": self.tokens,
+        }
+
+
+class MemoryStore:
+    def __init__(
+        self,
+        max_sessions: int = None,
+        token_budget: int = None,
+        idle_ttl_s: float = None,
+        namespace: str = "sessions",
+        backend: state.StateBackend = None,
+    ):
+        self.max_sessions = max_sessions or int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+        self.token_budget = token_budget or int(os.getenv("MEMORY_TOKEN_BUDGET", "4000"))
+        self.idle_ttl_s = idle_ttl_s or float(os.getenv("MEMORY_IDLE_TTL_S", "3600"))
+        self.namespace = namespace
+        self.backend = backend or state.backend
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+    def _update(self, session_id: str, fn):
+        """Runs fn(session) -> result as one atomic update of the stored session."""
+
+        def apply(data):
+            session = Session.from_dict(data) if data else Session()
+            result = fn(session)
+            return session.to_dict(), result
+
+        return self.backend.update(
+            self.namespace, session_id, apply, ttl_s=self.idle_ttl_s, max_entries=self.max_sessions
+        )
+
+    def history(self, session_id: str) -> tuple[list[types.Content], str]:
+        """Returns (turns, summary) for the session."""
+        data = self.backend.get(self.namespace, session_id)
+        session = Session.from_dict(data) if data else Session()
+        return session.turns, session.summary
+
+    def append(self, session_id: str, *turns: types.Content) -> list[types.Content]:
+        """Appends turns and returns the oldest ones popped to stay under the token budget."""
+
+        def add(session: Session) -> list[types.Content]:
+            for turn in turns:
+                session.turns.append(turn)
+                session.tokens += estimate_tokens(turn)
+
+            overflow = []
+            # Pop whole user/model pairs so the history keeps alternating roles,
+            # but always keep the latest exchange.
+            while session.tokens > self.token_budget and len(session.turns) > 2:
+                for turn in session.turns[:2]:
+                    session.tokens -= estimate_tokens(turn)
+                overflow.extend(session.turns[:2])
+                del session.turns[:2]
+            return overflow
+
+        return self._update(session_id, add)
+
+    def set_summary(self, session_id: str, summary: str):
+        def replace(session: Session):
+            session.summary = summary
+
+        self._update(session_id, replace)
+
+    def clear(self, session_id: str):
+        self.backend.delete(self.namespace, session_id)
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics, served as text at the server's /metrics endpoint.
+
+A small in-process registry with counters and histograms, so the agents can be
+instrumented without another dependency. Metrics are module-level and shared by
+everything in the process (the event loop and the browser worker threads):
+
+    with metrics.gemini_call(self.model, "rag"):
+        resp = await self.client.aio.models.generate_content(...)
+    metrics.TOOL_CALLS.inc(tool="start_browser", outcome="submitted")
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Sequence
+
+import tracing
+
+# Seconds; Gemini calls and browser actions can run long, so the tail goes to 60s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    @property
+    def family(self) -> str:
+        return self.name
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.family} {self.documentation}", f"# TYPE {self.family} {self.type}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    @property
+    def family(self) -> str:
+        return self.name + "_total"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.family}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., sum]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the with-block, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+@contextmanager
+def gemini_call(model: str, caller: str):
+    """Times one Gemini call and counts it as an error if it raises. Also traced as a span."""
+    with GEMINI_LATENCY.time(model=model, caller=caller), tracing.span(
+        "gemini.generate_content", model=model, caller=caller
+    ):
+        try:
+            yield
+        except Exception:
+            GEMINI_ERRORS.inc(model=model, caller=caller)
+            raise
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts (for streams: until the first byte), by route.",
+    ("method", "route", "status"),
+)
+GEMINI_LATENCY = Histogram(
+    "gemini_request_duration_seconds",
+    "Duration of one Gemini call (whole stream for streaming calls).",
+    ("model", "caller"),
+)
+GEMINI_ERRORS = Counter("gemini_request_errors", "Gemini calls that raised.", ("model", "caller"))
+GEMINI_RETRIES = Counter("gemini_retries", "Retries of failed Gemini calls in BrowserAgent.get_model_response.", ("model",))
+TOKENS = Counter("gemini_tokens", "Tokens reported in Gemini usage metadata.", ("kind",))
+ROUTER_DECISIONS = Counter("router_decisions", "Requests sent down the light or heavy path by router.py.", ("caller", "route"))
+TOOL_CALLS = Counter("tool_invocations", "Function calls requested by the model, by outcome.", ("tool", "outcome"))
+LOCAL_SEARCH_LATENCY = Histogram(
+    "local_search_duration_seconds",
+    "Duration of one query against the local BM25 index (see local_search.py).",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+RECORDED_CALLS = Counter(
+    "genai_recorded_calls",
+    "Gemini calls saved to or served from a recording (see genai_recorder.py).",
+    ("outcome",),
+)
+PROFILE_LOOKUPS = Counter(
+    "profile_lookups",
+    "User profile lookups: from the state cache, loaded from the users database, unknown user, or database error.",
+    ("outcome",),
+)
+START_URLS = Counter(
+    "browser_start_urls",
+    "Where browser tasks started: the caller's URL, one from the intent index, or the search engine default.",
+    ("source",),
+)
+BROWSER_STEPS = Histogram(
+    "browser_agent_steps",
+    "Model turns per BrowserAgent task.",
+    ("outcome",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+BROWSER_ACTION_LATENCY = Histogram(
+    "playwright_action_duration_seconds",
+    "Duration of one Computer Use action in the browser.",
+    ("action",),
+)
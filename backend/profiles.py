@@ -0,0 +1,237 @@
+"""
+Per-user profiles and the personalized model configs built from them.
+
+A profile is the user's row in the `users` table (see init_db.sql): the details
+the RAG agent fills forms with. Profiles are read through auth.get_db_connection
+and cached in the state backend (namespace "profiles", PROFILE_TTL_S), so a
+request costs a database query only when its user's profile is not cached, and
+save() updates every worker at once. The queries block, so async callers use
+aget() / asave(), which run them in a worker thread. A failed lookup is cached
+too, for PROFILE_ERROR_TTL_S, so a slow or unreachable database costs one
+attempt per user every few seconds rather than one per request.
+
+Turning a profile into a GenerateContentConfig is done once per profile version
+(its updated_at) and kept in a per-process LRU of PROFILE_CONFIG_CACHE_SIZE
+configs. The personalized config is a copy of the agent's base config with the
+user's details appended to the system instruction; the tool list and the rest
+are shared, not rebuilt. When a profile changes its version changes, so the
+next request builds a fresh config and the stale one is dropped.
+
+    store = ProfileStore()
+    profile = store.get("42")             # by users.id, or by email
+    store.save("42", phone="407-555-0100")
+    profile = await store.aget("42")      # from async code
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from google.genai import types
+
+import metrics
+import state
+
+# Profile columns a user can change (the email is their login, so it is not one)
+PROFILE_FIELDS = ("first_name", "last_name", "phone", "discord")
+COLUMNS = "id, email, first_name, last_name, phone, discord, profile_updated_at"
+
+
+@dataclass
+class Profile:
+    id: int
+    email: str
+    first_name: str = None
+    last_name: str = None
+    phone: str = None
+    discord: str = None
+    # Version of the profile; changes whenever it is saved
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Profile":
+        updated_at = row.get("profile_updated_at")
+        return cls(
+            id=row["id"],
+            email=row["email"],
+            first_name=row.get("first_name"),
+            last_name=row.get("last_name"),
+            phone=row.get("phone"),
+            discord=row.get("discord"),
+            updated_at=updated_at.timestamp() if hasattr(updated_at, "timestamp") else float(updated_at or 0),
+        )
+
+    @property
+    def full_name(self) -> str:
+        return " ".join(name for name in (self.first_name, self.last_name) if name)
+
+    def prompt(self) -> str:
+        """The profile as the "User information" line of a system instruction."""
+        details = [
+            ("first name", self.first_name),
+            ("last name", self.last_name),
+            ("full name", self.full_name),
+            ("email", self.email),
+            ("phone number", self.phone),
+            ("discord", self.discord),
+        ]
+        return "User information: " + ", ".join(f"{label}: {value}" for label, value in details if value)
+
+
+class ProfileStore:
+    def __init__(
+        self,
+        ttl_s: float = None,
+        connect: Callable = None,
+        namespace: str = "profiles",
+        backend: state.StateBackend = None,
+    ):
+        self.ttl_s = ttl_s or float(os.getenv("PROFILE_TTL_S", "300"))
+        self.error_ttl_s = float(os.getenv("PROFILE_ERROR_TTL_S", "10"))
+        # Opens a connection to the users database (auth.get_db_connection by default)
+        self._connect = connect
+        self.namespace = namespace
+        self.backend = backend or state.backend
+
+    def connect(self):
+        if self._connect is None:
+            # Imported on first use: auth pulls in psycopg2, passlib and jose
+            from auth import get_db_connection
+
+            self._connect = get_db_connection
+        return self._connect()
+
+    @staticmethod
+    def _where(user_id: str) -> tuple[str, tuple]:
+        # The server's user_id is either the users.id or the email the user signed in with
+        if str(user_id).isdigit():
+            return "id = %s", (int(user_id),)
+        return "email = %s", (user_id,)
+
+    def _query(self, sql: str, params: tuple) -> Optional[dict]:
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            conn.commit()
+            return row
+        finally:
+            cur.close()
+            conn.close()
+
+    def _cached(self, user_id: str) -> tuple[bool, Optional[Profile]]:
+        """(found, profile) from the cache."""
+        cached = self.backend.get(self.namespace, str(user_id))
+        if cached is None:
+            return False, None
+        metrics.PROFILE_LOOKUPS.inc(outcome="cached")
+        # {} marks a user that has no row, or whose lookup failed a moment ago
+        return True, Profile(**cached) if cached else None
+
+    def _load(self, user_id: str) -> Optional[Profile]:
+        where, params = self._where(user_id)
+        try:
+            row = self._query(f"SELECT {COLUMNS} FROM users WHERE {where}", params)
+        except Exception:
+            # Remembered briefly, so a database that is down isn't retried on every request;
+            # until then the user gets the base config
+            metrics.PROFILE_LOOKUPS.inc(outcome="error")
+            self.backend.set(self.namespace, str(user_id), {}, ttl_s=self.error_ttl_s)
+            return None
+        profile = Profile.from_row(row) if row else None
+        metrics.PROFILE_LOOKUPS.inc(outcome="loaded" if profile else "missing")
+        self.backend.set(self.namespace, str(user_id), asdict(profile) if profile else {}, ttl_s=self.ttl_s)
+        return profile
+
+    def get(self, user_id: str) -> Optional[Profile]:
+        """The user's profile, or None for an unknown user or if the database can't be reached."""
+        found, profile = self._cached(user_id)
+        return profile if found else self._load(user_id)
+
+    async def aget(self, user_id: str) -> Optional[Profile]:
+        """get() for async callers: a cache miss queries the database off the event loop."""
+        found, profile = self._cached(user_id)
+        return profile if found else await asyncio.to_thread(self._load, user_id)
+
+    def save(self, user_id: str, **fields) -> Optional[Profile]:
+        """Updates profile fields and returns the new profile (None for an unknown user)."""
+        unknown = set(fields) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError(f"Not profile fields: {', '.join(sorted(unknown))}")
+        where, params = self._where(user_id)
+        assignments = "".join(f"{name} = %s, " for name in fields)
+        row = self._query(
+            f"UPDATE users SET {assignments}profile_updated_at = CURRENT_TIMESTAMP WHERE {where}"
+            f" RETURNING {COLUMNS}",
+            tuple(fields.values()) + params,
+        )
+        profile = Profile.from_row(row) if row else None
+        self.invalidate(user_id)
+        if profile:
+            # Both ways of naming the user see the new version right away, on every worker
+            for key in (str(profile.id), profile.email):
+                self.backend.set(self.namespace, key, asdict(profile), ttl_s=self.ttl_s)
+        return profile
+
+    async def asave(self, user_id: str, **fields) -> Optional[Profile]:
+        """save() for async callers, off the event loop."""
+        return await asyncio.to_thread(self.save, user_id, **fields)
+
+    def invalidate(self, user_id: str):
+        self.backend.delete(self.namespace, str(user_id))
+
+
+class ConfigCache:
+    """LRU of users.id -> (profile version, personalized config), per process."""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("PROFILE_CONFIG_CACHE_SIZE", "1024"))
+        self._entries: OrderedDict[str, tuple[float, types.GenerateContentConfig]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.builds = 0
+        self.build_s = 0.0
+
+    def get(self, profile: Profile, build: Callable[[Profile], types.GenerateContentConfig]) -> types.GenerateContentConfig:
+        key = str(profile.id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == profile.updated_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        # Built outside the lock; two requests racing on a new version both build, one wins
+        start = time.perf_counter()
+        config = build(profile)
+        with self._lock:
+            self._entries[key] = (profile.updated_at, config)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.builds += 1
+            self.build_s += time.perf_counter() - start
+        return config
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.builds
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "builds": self.builds,
+                "hit_rate": self.hits / total if total else 0.0,
+                "avg_build_s": round(self.build_s / self.builds, 6) if self.builds else 0.0,
+            }
+
+
+profiles = ProfileStore()
@@ -0,0 +1,151 @@
+"""
+Exact-match answer cache with in-flight request coalescing.
+
+The key is a hash of the model, the generation config and the normalized request
+(case and whitespace folded), so it only matches when the upstream call would be
+identical. Concurrent misses on the same key share a single upstream call: the
+first caller runs it, the others await its result ("single-flight").
+
+Answers are kept in the state backend (see state.py), so with a shared backend
+every server worker can answer from them; coalescing is per process.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Awaitable, Callable, Optional, Union
+
+from google.genai import types
+
+import state
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def cache_key(
+    model: str,
+    contents: Union[str, list[types.Content]],
+    config: Optional[types.GenerateContentConfig] = None,
+) -> str:
+    if isinstance(contents, str):
+        request = normalize_text(contents)
+    else:
+        request = json.dumps(
+            [
+                [content.role, [normalize_text(part.text or "") for part in (content.parts or [])]]
+                for content in contents
+            ]
+        )
+    config_json = config.model_dump_json(exclude_none=True) if config else ""
+    return hashlib.sha256(f"{model}\0{config_json}\0{request}".encode()).hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl_s: float = None,
+        max_entries: int = None,
+        namespace: str = "answers",
+        backend: state.StateBackend = None,
+    ):
+        self.ttl_s = ttl_s or float(os.getenv("RESPONSE_CACHE_TTL_S", "600"))
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+        self.namespace = namespace
+        self.backend = backend or state.backend
+        self._inflight: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    def get(self, key: str) -> Optional[str]:
+        answer = self.backend.get(self.namespace, key)
+        if answer is not None:
+            with self._lock:
+                self.hits += 1
+        return answer
+
+    def put(self, key: str, answer: str):
+        if not answer:
+            return
+        self.backend.set(self.namespace, key, answer, ttl_s=self.ttl_s, max_entries=self.max_entries)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[tuple[str, bool]]]) -> str:
+        """Returns the cached answer for key, or runs compute() once for all concurrent callers.
+
+        compute returns (answer, cacheable); only cacheable answers are stored. The
+        shared call runs as its own task and is only cancelled once every caller
+        waiting on it has been cancelled (e.g. all their clients disconnected).
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        while True:
+            flight = self._inflight.get(key)
+            if flight is None:
+                self.misses += 1
+                self.upstream_calls += 1
+                flight = _Flight(asyncio.ensure_future(self._run(key, compute)))
+                self._inflight[key] = flight
+            else:
+                self.coalesced += 1
+
+            flight.waiters += 1
+            try:
+                # wait() leaves the shared task alone, so a CancelledError here is this caller's own
+                await asyncio.wait({flight.task})
+            except asyncio.CancelledError:
+                flight.waiters -= 1
+                if flight.waiters == 0:
+                    flight.task.cancel()
+                    # Callers arriving from now on start afresh rather than join a cancelled call
+                    self._drop(key, flight)
+                raise
+            flight.waiters -= 1
+            if flight.task.cancelled():
+                # Cancelled for callers that all went away, not for this one: start a new call
+                self._drop(key, flight)
+                continue
+            return flight.task.result()
+
+    def _drop(self, key: str, flight: _Flight):
+        # Only this flight: a newer one for the same key must keep running
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _run(self, key: str, compute) -> str:
+        try:
+            answer, cacheable = await compute()
+        finally:
+            flight = self._inflight.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._inflight[key]
+        if cacheable:
+            self.put(key, answer)
+        return answer
+
+    def stats(self) -> dict:
+        entries = self.backend.count(self.namespace)
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "upstream_calls": self.upstream_calls,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "inflight": len(self._inflight),
+            }
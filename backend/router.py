@@ -0,0 +1,250 @@
+"""
+Latency-aware model routing for Agent and RAG_Agent.
+
+Every prompt is classified locally before the model call:
+
+    light   small talk and simple lookups: the faster model, thinking off
+    heavy   everything else, including anything that may need a tool: the
+            agent's usual model and config
+
+Rules from intents.py go first (browser tasks, long prompts and comparisons or
+calculations are heavy; greetings are light). What is left goes to a small naive
+Bayes classifier if one has been trained (ROUTER_MODEL), else to the lookup
+heuristic. ROUTER_ENABLED=0 sends everything down the heavy path.
+
+When ROUTER_LOG is set (it is off by default: it keeps the start of every
+prompt), each decision is appended to it as JSONL with the call's latency and
+tokens, and the same log is the training data:
+
+    python router.py report router_decisions.jsonl   # latency per route
+    python router.py train router_decisions.jsonl    # writes ROUTER_MODEL
+
+Heavy-routed requests that called a tool or thought for more than
+ROUTER_THINKING_LABEL tokens are labelled "heavy", the others "light", since a
+request the heavy model answered without much thinking was a simple one.
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from google.genai import types
+
+import metrics
+from intents import looks_like_browser_task, looks_like_lookup, looks_like_small_talk, needs_reasoning
+from semantic_cache import normalize
+
+
+@dataclass
+class Route:
+    name: str  # "light" | "heavy"
+    model: str
+    # None keeps the config's own thinking settings
+    thinking_budget: Optional[int]
+    reason: str
+    p_heavy: Optional[float] = None
+
+    def apply(self, config: types.GenerateContentConfig) -> types.GenerateContentConfig:
+        if self.thinking_budget is None:
+            return config
+        return config.model_copy(update={"thinking_config": types.ThinkingConfig(thinking_budget=self.thinking_budget)})
+
+
+def features(prompt: str) -> list[str]:
+    words = normalize(prompt)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over word unigrams and bigrams, with add-one smoothing."""
+
+    def __init__(self, class_counts: dict, token_counts: dict):
+        self.class_counts = class_counts
+        self.token_counts = token_counts
+        self.vocab = set().union(*(counts.keys() for counts in token_counts.values())) if token_counts else set()
+        self.totals = {label: sum(counts.values()) for label, counts in token_counts.items()}
+
+    @classmethod
+    def fit(cls, examples: list[tuple[str, str]]) -> "NaiveBayes":
+        class_counts, token_counts = Counter(), defaultdict(Counter)
+        for text, label in examples:
+            class_counts[label] += 1
+            token_counts[label].update(features(text))
+        return cls(dict(class_counts), {label: dict(counts) for label, counts in token_counts.items()})
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayes":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["class_counts"], data["token_counts"])
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"class_counts": self.class_counts, "token_counts": self.token_counts}, f)
+
+    def prob(self, text: str, label: str = "heavy") -> float:
+        """P(label | text)."""
+        if label not in self.class_counts:
+            return 0.0
+        n = sum(self.class_counts.values())
+        tokens = features(text)
+        scores = {}
+        for c, count in self.class_counts.items():
+            counts, total = self.token_counts.get(c, {}), self.totals.get(c, 0)
+            score = math.log(count / n)
+            for token in tokens:
+                score += math.log((counts.get(token, 0) + 1) / (total + len(self.vocab) + 1))
+            scores[c] = score
+        top = max(scores.values())
+        exp = {c: math.exp(s - top) for c, s in scores.items()}
+        return exp[label] / sum(exp.values())
+
+
+class DecisionLog:
+    """Appends one JSON line per routed call; opened on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        if not self.path:
+            return
+        line = json.dumps(record)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+
+
+decisions = DecisionLog(os.getenv("ROUTER_LOG", ""))
+
+
+class ModelRouter:
+    def __init__(self, caller: str, heavy_model: str, light_model: str = None):
+        self.caller = caller
+        self.enabled = os.getenv("ROUTER_ENABLED", "1") == "1"
+        self.heavy_model = heavy_model
+        self.light_model = os.getenv(f"ROUTER_{caller.upper()}_LIGHT_MODEL") or light_model or heavy_model
+        self.max_light_words = int(os.getenv("ROUTER_MAX_LIGHT_WORDS", "25"))
+        self.threshold = float(os.getenv("ROUTER_HEAVY_THRESHOLD", "0.5"))
+        model_path = os.getenv("ROUTER_MODEL", "router_model.json")
+        self.classifier = NaiveBayes.load(model_path) if os.path.exists(model_path) else None
+
+    def _light(self, reason: str, p_heavy: float = None) -> Route:
+        return Route("light", self.light_model, 0, reason, p_heavy)
+
+    def _heavy(self, reason: str, p_heavy: float = None) -> Route:
+        return Route("heavy", self.heavy_model, None, reason, p_heavy)
+
+    def route(self, prompt: str) -> Route:
+        route = self._decide(prompt)
+        metrics.ROUTER_DECISIONS.inc(caller=self.caller, route=route.name)
+        return route
+
+    def _decide(self, prompt: str) -> Route:
+        if not self.enabled:
+            return self._heavy("router disabled")
+        if looks_like_browser_task(prompt):
+            return self._heavy("browser task")
+        if looks_like_small_talk(prompt):
+            return self._light("small talk")
+        if len(prompt.split()) > self.max_light_words:
+            return self._heavy("long prompt")
+        if needs_reasoning(prompt):
+            return self._heavy("reasoning")
+        if self.classifier is not None:
+            p_heavy = self.classifier.prob(prompt, "heavy")
+            if p_heavy >= self.threshold:
+                return self._heavy("classifier", p_heavy)
+            return self._light("classifier", p_heavy)
+        if looks_like_lookup(prompt):
+            return self._light("lookup")
+        return self._heavy("default")
+
+    def record(self, route: Route, prompt: str, latency_s: float, response=None, used_tools: bool = False):
+        """Logs a routed call with its latency and token counts (from response.usage_metadata)."""
+        metadata = getattr(response, "usage_metadata", None)
+        decisions.write(
+            {
+                "ts": time.time(),
+                "caller": self.caller,
+                "route": route.name,
+                "reason": route.reason,
+                "p_heavy": route.p_heavy,
+                "model": route.model,
+                "thinking_budget": route.thinking_budget,
+                "prompt": prompt[:500],
+                "latency_s": round(latency_s, 4),
+                "prompt_tokens": getattr(metadata, "prompt_token_count", None),
+                "output_tokens": getattr(metadata, "candidates_token_count", None),
+                "thinking_tokens": getattr(metadata, "thoughts_token_count", None),
+                "used_tools": used_tools,
+            }
+        )
+
+
+def load_decisions(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def training_examples(records: list[dict], thinking_label: int) -> list[tuple[str, str]]:
+    examples = []
+    for r in records:
+        # Only the heavy path shows how much work a prompt really needed
+        if r["route"] != "heavy" or r["reason"] == "browser task":
+            continue
+        heavy = r.get("used_tools") or (r.get("thinking_tokens") or 0) > thinking_label
+        examples.append((r["prompt"], "heavy" if heavy else "light"))
+    return examples
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def print_report(records: list[dict]):
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r["caller"], r["route"])].append(r)
+    print(f"{'caller':<8} {'route':<6} {'n':>6} {'p50 s':>8} {'p95 s':>8} {'avg tokens':>11}")
+    for (caller, route), rows in sorted(groups.items()):
+        latencies = [r["latency_s"] for r in rows]
+        tokens = [
+            (r.get("prompt_tokens") or 0) + (r.get("output_tokens") or 0) + (r.get("thinking_tokens") or 0)
+            for r in rows
+        ]
+        print(
+            f"{caller:<8} {route:<6} {len(rows):>6} {percentile(latencies, 0.5):>8.2f} "
+            f"{percentile(latencies, 0.95):>8.2f} {sum(tokens) / len(tokens):>11.0f}"
+        )
+    reasons = Counter(f"{r['route']}:{r['reason']}" for r in records)
+    print("\n" + ", ".join(f"{reason} {n}" for reason, n in reasons.most_common()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["report", "train"])
+    parser.add_argument("log", nargs="?", default=os.getenv("ROUTER_LOG") or "router_decisions.jsonl")
+    parser.add_argument("--out", default=os.getenv("ROUTER_MODEL", "router_model.json"))
+    parser.add_argument("--thinking-label", type=int, default=int(os.getenv("ROUTER_THINKING_LABEL", "512")))
+    args = parser.parse_args()
+
+    records = load_decisions(args.log)
+    if args.command == "report":
+        print_report(records)
+    else:
+        examples = training_examples(records, args.thinking_label)
+        labels = Counter(label for _, label in examples)
+        if len(labels) < 2:
+            raise SystemExit(f"Need both light and heavy examples to train, got {dict(labels)}")
+        NaiveBayes.fit(examples).save(args.out)
+        print(f"Trained on {len(examples)} requests ({dict(labels)}), saved to {args.out}")
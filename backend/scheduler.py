@@ -0,0 +1,163 @@
+"""
+Priority scheduling between interactive answers and browser automations.
+
+Both kinds of work spend the same Gemini quota, so they are split into two
+priority classes:
+
+- interactive: Agent.chat/achat and RAG_Agent.generate*. These never wait here
+  (admission.py already bounds them); their in-flight upstream calls are only
+  counted, with `gate.interactive()`.
+- automation: gemini_computer_use runs. They run in their own bounded lane (see
+  BrowserJobManager), fed from a FairShareQueue that takes turns between users,
+  and every model call they make goes through `gate.automation(token)`, which
+  waits while interactive calls are using the shared capacity.
+
+So a burst of chat traffic pauses automations between steps instead of queueing
+behind them. Limits come from GEMINI_MAX_CONCURRENCY (shared upstream calls) and
+AUTOMATION_MAX_CALLS (automation calls in flight at once).
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Hashable, Optional
+
+from computer_use.cancellation import CancelToken
+
+
+class PriorityGate:
+    """Shares upstream model capacity between interactive and automation calls.
+
+    Thread-safe: automation calls come from browser worker threads, interactive
+    ones from the event loop. Entering `interactive()` never blocks.
+    """
+
+    def __init__(self, max_concurrent: int = None, max_automation: int = None):
+        self.max_concurrent = max_concurrent or int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+        self.max_automation = max_automation or int(os.getenv("AUTOMATION_MAX_CALLS", "4"))
+        self.interactive_active = 0
+        self.automation_active = 0
+        self.automation_waits = 0
+        self.automation_wait_s = 0.0
+        self._cond = threading.Condition()
+
+    def _automation_may_run(self) -> bool:
+        return (
+            self.automation_active < self.max_automation
+            and self.interactive_active + self.automation_active < self.max_concurrent
+        )
+
+    @contextmanager
+    def interactive(self):
+        with self._cond:
+            self.interactive_active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.interactive_active -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def automation(self, token: Optional[CancelToken] = None):
+        """Holds one automation call slot; waits (cancellably) until interactive load leaves room."""
+        start = time.monotonic()
+        with self._cond:
+            if not self._automation_may_run():
+                self.automation_waits += 1
+            while not self._automation_may_run():
+                self._cond.wait(0.25)
+                if token is not None:
+                    token.check()
+            self.automation_active += 1
+            self.automation_wait_s += time.monotonic() - start
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.automation_active -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "interactive_active": self.interactive_active,
+                "automation_active": self.automation_active,
+                "max_concurrent": self.max_concurrent,
+                "max_automation": self.max_automation,
+                "automation_waits": self.automation_waits,
+                "automation_wait_s": round(self.automation_wait_s, 3),
+            }
+
+
+class FairShareQueue:
+    """Blocking queue that takes turns between owners (users) instead of plain FIFO.
+
+    Each owner has its own FIFO. get() serves the owner with the fewest items
+    still running (reported back with task_done), and among those the one that
+    has waited longest since it arrived or was last served, so one user with many
+    queued tasks cannot hold up everyone else's.
+    """
+
+    def __init__(self):
+        # Per owner with queued or running items: its FIFO, running count and turn
+        self._queues: dict = {}
+        self._running: dict = {}
+        self._turn: dict = {}
+        self._clock = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, owner: Hashable, item: Any):
+        with self._cond:
+            if owner not in self._queues:
+                self._queues[owner] = deque()
+                self._turn[owner] = self._clock = self._clock + 1
+            self._queues[owner].append(item)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self) -> Any:
+        """Next item, or None once the queue is closed."""
+        with self._cond:
+            while not self._size and not self._closed:
+                self._cond.wait()
+            if not self._size:
+                return None
+            owner = min(
+                (owner for owner, items in self._queues.items() if items),
+                key=lambda owner: (self._running.get(owner, 0), self._turn[owner]),
+            )
+            item = self._queues[owner].popleft()
+            self._size -= 1
+            self._running[owner] = self._running.get(owner, 0) + 1
+            self._turn[owner] = self._clock = self._clock + 1
+            return item
+
+    def task_done(self, owner: Hashable):
+        """Marks one item taken for owner as finished."""
+        with self._cond:
+            self._running[owner] -= 1
+            if not self._running[owner]:
+                del self._running[owner]
+                if not self._queues[owner]:
+                    del self._queues[owner]
+                    del self._turn[owner]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return self._size
+
+    def waiting_by_owner(self) -> dict:
+        with self._cond:
+            return {str(owner): len(items) for owner, items in self._queues.items() if items}
+
+
+gate = PriorityGate()
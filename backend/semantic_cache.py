@@ -0,0 +1,158 @@
+"""
+Semantic answer cache for RAG_Agent.
+
+Prompts are normalized and embedded locally (word unigrams plus character
+trigrams, hashed into a sparse vector), so "what dental plans are there?" and
+"tell me about the dental plan" land on the same entry without a network call.
+A stored answer is returned when cosine similarity is above the threshold.
+Entries expire after a TTL and the least recently used ones are evicted once the
+cache is full.
+
+The search runs over an in-process copy of the entries. With a shared state
+backend (see state.py) new entries are also written there, and each lookup first
+pulls in whatever other workers added since the last one.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import state
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "do", "does", "for", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "please", "tell", "that", "the", "there", "to", "ucf",
+    "what", "whats", "about", "with", "you", "your", "any", "get", "know", "want", "would",
+}
+
+Vector = dict[str, float]
+
+
+def normalize(prompt: str) -> list[str]:
+    words = re.findall(r"[a-z0-9]+", prompt.lower().replace("'", ""))
+    # Light stemming so plurals match ("plans" -> "plan")
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+    return [w for w in words if w not in STOPWORDS]
+
+
+def embed(prompt: str) -> Vector:
+    words = normalize(prompt)
+    features = Counter(f"w:{w}" for w in words)
+    joined = " ".join(words)
+    features.update(f"c:{joined[i:i + 3]}" for i in range(len(joined) - 2))
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class Entry:
+    vector: Vector
+    answer: str
+    created: float
+    latency_s: float
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = None,
+        ttl_s: float = None,
+        max_entries: int = None,
+        embed_fn: Callable[[str], Vector] = embed,
+        namespace: str = "semantic",
+        backend: state.StateBackend = None,
+    ):
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+        self.ttl_s = ttl_s or float(os.getenv("SEMANTIC_CACHE_TTL_S", "86400"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+        self.embed_fn = embed_fn
+        self.namespace = namespace
+        self.backend = backend or state.backend
+        self._entries: OrderedDict[str, Entry] = OrderedDict()
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.latency_saved_s = 0.0
+
+    def _sync(self):
+        # Caller holds the lock
+        if not self.backend.shared:
+            return
+        for key, data, updated_at in self.backend.items(self.namespace, since=self._synced_at):
+            self._entries[key] = Entry(data["vector"], data["answer"], data["created"], data["latency_s"])
+            self._entries.move_to_end(key)
+            self._synced_at = max(self._synced_at, updated_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, prompt: str) -> Optional[str]:
+        vector = self.embed_fn(prompt)
+        now = time.time()
+        with self._lock:
+            self._sync()
+            best_key, best_score = None, 0.0
+            for key, entry in list(self._entries.items()):
+                if now - entry.created > self.ttl_s:
+                    del self._entries[key]
+                    continue
+                score = cosine(vector, entry.vector)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.latency_saved_s += entry.latency_s
+            return entry.answer
+
+    def put(self, prompt: str, answer: str, latency_s: float = 0.0):
+        if not answer:
+            return
+        key = " ".join(normalize(prompt))
+        entry = Entry(self.embed_fn(prompt), answer, time.time(), latency_s)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.backend.shared:
+            self.backend.set(
+                self.namespace,
+                key,
+                {"vector": entry.vector, "answer": answer, "created": entry.created, "latency_s": latency_s},
+                ttl_s=self.ttl_s,
+                max_entries=self.max_entries,
+            )
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_s": round(self.latency_saved_s, 3),
+            }
@@ -1,11 +1,82 @@
-from fastapi import FastAPI, Depends
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import OAuth2PasswordRequestForm
 import uvicorn
 from base_agent import Agent
 from RAG_agent import RAG_Agent
+import admission
+import auth
+from auth import current_user, optional_user
+import metrics
+import tracing
+import usage
+import scheduler
+import state
+import local_search
+from profiles import profiles
+from warm_cache import build_questions, warm
+
+
+# Built on first use (see get_agent / get_retrieval_agent), so importing the
+# server and binding the port stay fast; WARM_UP_ON_STARTUP builds them up front.
+agent: Optional[Agent] = None
+retrieval_agent: Optional[RAG_Agent] = None
+
+
+def get_agent() -> Agent:
+    global agent
+    if agent is None:
+        agent = Agent()
+    return agent
+
+
+def get_retrieval_agent() -> RAG_Agent:
+    global retrieval_agent
+    if retrieval_agent is None:
+        retrieval_agent = RAG_Agent()
+    return retrieval_agent
+
 
-app = FastAPI()
+def warm_up(browser: bool = False):
+    """Builds the agents ahead of the first request. With browser=True also loads
+    the Computer Use stack and starts the browser workers (and pool, if configured)."""
+    get_agent()
+    get_retrieval_agent()
+    if get_retrieval_agent().retrieval != "vertex":
+        # Reads the documents (PDF text from its cache) before the first question needs them
+        local_search.index.refresh()
+    if browser:
+        get_retrieval_agent().jobs.warm_up()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("WARM_UP_ON_STARTUP", "0") == "1":
+        # Runs before the server accepts connections, so the first request isn't the slow one
+        warm_up(browser=os.getenv("WARM_UP_BROWSER", "0") == "1")
+    tasks = []
+    if os.getenv("WARM_CACHE_ON_STARTUP", "0") == "1":
+        # Fill the answer caches in the background; requests are served meanwhile
+        concurrency = int(os.getenv("WARM_CACHE_CONCURRENCY", "4"))
+        tasks.append(asyncio.create_task(warm(get_retrieval_agent(), build_questions(), concurrency)))
+    yield
+    for task in tasks:
+        task.cancel()
+    if retrieval_agent is not None:
+        retrieval_agent.jobs.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -14,18 +85,348 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Session-Id"],  # So the frontend can read the /chat session
 )
 
-agent = Agent()
-retrieval_agent = RAG_Agent()
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    # Root span of the request's trace (or a child of the caller's, via traceparent)
+    with tracing.span("HTTP " + request.method, parent=tracing.parse_traceparent(request.headers.get("traceparent"))) as span:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            if span.trace_id:
+                response.headers["X-Trace-Id"] = span.trace_id
+            return response
+        finally:
+            # The route template, not the raw path, so ids don't blow up the label set
+            route = request.scope.get("route")
+            route = route.path if route else "unmatched"
+            span.update_name(f"{request.method} {route}")
+            span.set_attribute("http.route", route)
+            span.set_attribute("http.status_code", status)
+            metrics.HTTP_LATENCY.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=route,
+                status=str(status),
+            )
+
+
+def sse(event: dict) -> str:
+    """Formats an agent event dict as a Server-Sent Events frame."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded(request: Request, exc: admission.Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(usage.BudgetExceeded)
+async def budget_exceeded(request: Request, exc: usage.BudgetExceeded):
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
+
+async def metered_events(events, session_id: str = None, user_id: str = None):
+    """Runs an agent event stream under the request's budget and adds its usage to the done event."""
+    try:
+        with usage.metered(session_id, user_id) as spent:
+            async for event in events:
+                if event["type"] == "done":
+                    event = {**event, "usage": spent.to_dict()}
+                yield event
+    except usage.BudgetExceeded as e:
+        yield {"type": "error", "message": str(e)}
+
+
+async def stream_with_slot(limiter: admission.AdmissionLimiter, events) -> StreamingResponse:
+    """Streams agent events as SSE while holding an admission slot.
+
+    The slot is taken before the response starts, so an overloaded server still
+    answers with a plain 429/503 instead of a broken stream.
+    """
+    await limiter.acquire()
+    start = time.monotonic()
+    released = False
+
+    async def release():
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release(time.monotonic() - start)
+
+    async def body():
+        try:
+            async for event in events:
+                yield sse(event)
+        finally:
+            await release()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so deltas reach the browser as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Covers clients that go away before the body is ever iterated
+        background=BackgroundTask(release),
+    )
+
+
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "120"))
+
+
+async def cancel_on_disconnect(request: Request, coro):
+    """Runs coro, cancelling it if the client disconnects or REQUEST_TIMEOUT_S passes.
+
+    Cancellation reaches the in-flight Gemini call, so abandoned requests stop
+    spending tokens. (Streaming responses get this from Starlette already.)
+    """
+    task = asyncio.ensure_future(coro)
+    deadline = time.monotonic() + REQUEST_TIMEOUT_S
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.5)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            # 499: client closed request (nobody is listening for it anyway)
+            return Response(status_code=499)
+        if time.monotonic() >= deadline:
+            task.cancel()
+            raise HTTPException(status_code=504, detail="Request took too long")
+
+
+SESSION_COOKIE = "session_id"
+
+
+# Who a request is for comes from its bearer token (see auth.py), never from a
+# parameter: a user_id anyone can pass would let them answer as someone else
+@app.post("/signin")
+async def signin(form_data: OAuth2PasswordRequestForm = Depends()):
+    return await auth.signin(form_data)
 
 @app.get("/chat")
-async def chat(prompt):
-    return agent.chat(prompt)
+async def chat(request: Request, response: Response, prompt, session_id: str = None, user_id: Optional[str] = Depends(optional_user)):
+    # Callers without a session get their own, handed back as a cookie (and in
+    # X-Session-Id); a shared default would mix everyone's history into one
+    session_id = session_id or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    response.headers["X-Session-Id"] = session_id
+    async with admission.endpoints["chat"].slot():
+        with usage.metered(session_id, user_id):
+            return await cancel_on_disconnect(request, get_agent().achat(prompt, session_id))
 
 @app.get("/RAG")
-async def RAG(prompt):
-    return await retrieval_agent.generate(prompt)
-    
+async def RAG(request: Request, prompt, user_id: Optional[str] = Depends(optional_user)):
+    async with admission.endpoints["rag"].slot():
+        with usage.metered(user_id=user_id):
+            return await cancel_on_disconnect(request, get_retrieval_agent().generate(prompt, user_id))
+
+@app.get("/RAG/stream")
+async def RAG_stream(prompt, user_id: Optional[str] = Depends(optional_user)):
+    events = metered_events(get_retrieval_agent().generate_stream(prompt, user_id=user_id), user_id=user_id)
+    return await stream_with_slot(admission.endpoints["rag_stream"], events)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/usage")
+async def usage_totals(session_id: str = None, user_id: Optional[str] = Depends(optional_user)):
+    """Tokens and steps spent in the current budget window, per session and/or (signed-in) user."""
+    totals = {}
+    if session_id:
+        totals["session"] = usage.ledger.totals("session", session_id)
+    if user_id:
+        totals["user"] = usage.ledger.totals("user", user_id)
+    return totals
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return {"gate": scheduler.gate.stats(), "automation_lane": get_retrieval_agent().jobs.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "semantic": get_retrieval_agent().cache.stats(),
+        "rag_exact": get_retrieval_agent().answers.stats(),
+        "chat_exact": get_agent().answers.stats(),
+        "profile_configs": get_retrieval_agent().configs.stats(),
+    }
+
+async def check_owner(user_id: str, user: str):
+    """403 unless user_id (an email or users.id) names the signed-in user."""
+    if user_id == user:
+        return
+    own = await profiles.aget(user)
+    if own is None or str(own.id) != user_id:
+        raise HTTPException(status_code=403, detail="Not your profile")
+
+@app.get("/users/{user_id}/profile")
+async def get_profile(user_id: str, user: str = Depends(current_user)):
+    await check_owner(user_id, user)
+    profile = await profiles.aget(user)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+    return profile
+
+@app.put("/users/{user_id}/profile")
+async def update_profile(user_id: str, first_name: str = None, last_name: str = None, phone: str = None, discord: str = None, user: str = Depends(current_user)):
+    await check_owner(user_id, user)
+    fields = {"first_name": first_name, "last_name": last_name, "phone": phone, "discord": discord}
+    profile = await profiles.asave(user, **{name: value for name, value in fields.items() if value is not None})
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+    return profile
+
+@app.post("/jobs/browser")
+async def submit_browser_job(query: str, initial_url: str = None, user_id: Optional[str] = Depends(optional_user)):
+    job = get_retrieval_agent().jobs.submit(query, initial_url, owner=user_id or "anonymous")
+    return job.to_dict()
+
+@app.get("/jobs/pool")
+async def browser_pool_stats():
+    pool = get_retrieval_agent().jobs.pool
+    return pool.stats() if pool else {"size": 0}
+
+def owned_job(job_id: str, user_id: Optional[str]):
+    """The caller's job. Jobs hold the owner's query and profile details, so
+    another user's job is a 404 just like one that doesn't exist."""
+    job = get_retrieval_agent().jobs.get(job_id)
+    if job is None or job.owner != (user_id or "anonymous"):
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@app.get("/jobs")
+async def list_jobs(user_id: Optional[str] = Depends(optional_user)):
+    owner = user_id or "anonymous"
+    return [job.to_dict() for job in get_retrieval_agent().jobs.list() if job.owner == owner]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, user_id: Optional[str] = Depends(optional_user)):
+    return owned_job(job_id, user_id).to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, user_id: Optional[str] = Depends(optional_user)):
+    owned_job(job_id, user_id)
+    job = get_retrieval_agent().jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, user_id: Optional[str] = Depends(optional_user)):
+    job = owned_job(job_id, user_id)
+
+    async def events():
+        nonlocal job
+        sent = 0
+        while True:
+            # Events are appended from the job's worker thread; send whatever is new
+            new_events = job.events[sent:]
+            sent += len(new_events)
+            for event in new_events:
+                yield sse(event)
+            if job.done and sent == len(job.events):
+                return
+            await asyncio.sleep(0.5)
+            # A job run by another worker is a snapshot; fetch the latest one
+            job = get_retrieval_agent().jobs.get(job_id) or job
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket, mode: str = "rag", session_id: str = None, token: str = None):
+    """Persistent chat over one socket.
+
+    Browsers can't set headers on a WebSocket, so a signed-in client passes its
+    bearer token as ?token=.
+
+    The client sends either a plain prompt or {"prompt": ..., "mode": "chat" | "rag"}
+    and receives the same event dicts as /RAG/stream, one JSON message each. The
+    conversation history is kept server-side, under the session id the server
+    sends first. A signed-in client can reconnect to one of its own sessions
+    with ?session_id=. Sessions belong to the user, so nobody else can attach to
+    them. Anonymous clients get a new session on every connection.
+    """
+    try:
+        user_id = auth.user_from_token(token)
+    except HTTPException:
+        # 1008: policy violation
+        await websocket.close(code=1008)
+        return
+
+    connections = admission.endpoints["ws"]
+    try:
+        await connections.acquire()
+    except admission.Overloaded:
+        # 1013: "try again later"
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    if not (user_id and session_id):
+        session_id = uuid.uuid4().hex
+    # Memory is keyed by user as well, so a guessed or leaked id only ever reaches the caller's own history
+    memory_id = f"{user_id}:{session_id}" if user_id else session_id
+    await websocket.send_json({"type": "session", "session_id": session_id})
+
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = raw
+            if not isinstance(message, dict):
+                message = {"prompt": str(message)}
+
+            prompt = message.get("prompt", "")
+            if not isinstance(prompt, str):
+                await websocket.send_json({"type": "error", "message": "prompt must be a string"})
+                continue
+            if not prompt.strip():
+                await websocket.send_json({"type": "error", "message": "Empty prompt"})
+                continue
+
+            if message.get("mode", mode) == "chat":
+                limiter, events = admission.endpoints["chat"], get_agent().achat_stream(prompt, memory_id)
+            else:
+                limiter, events = admission.endpoints["rag_stream"], get_retrieval_agent().generate_stream(prompt, memory_id, user_id)
+            events = metered_events(events, memory_id, user_id)
+            try:
+                async with limiter.slot():
+                    start, first = time.perf_counter(), True
+                    async for event in events:
+                        await websocket.send_json(event)
+                        if first:
+                            # Same meaning as for HTTP: time until the answer starts
+                            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, method="WS", route="/ws/chat", status=event["type"])
+                            first = False
+            except admission.Overloaded as e:
+                await websocket.send_json({"type": "error", "message": str(e), "retry_after": e.retry_after})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connections.release()
+
 if __name__ == "__main__":
-    uvicorn.run("server:app", host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = int(os.getenv("SERVER_WORKERS", "1"))
+    if workers > 1 and not state.backend.shared:
+        raise SystemExit("SERVER_WORKERS > 1 needs a shared state backend (STATE_BACKEND=sqlite), or each worker has its own sessions and jobs")
+    uvicorn.run("server:app", host="0.0.0.0", port=8000, workers=workers)
@@ -0,0 +1,259 @@
+"""
+Shared state for sessions, caches, budgets and browser job status.
+
+Everything that has to look the same to every server process goes through a
+StateBackend, picked with STATE_BACKEND:
+
+    memory   (default) a dict in this process; fastest, but with
+             `uvicorn --workers N` or several nodes every worker has its own
+    sqlite   one SQLite file (STATE_DB, default state.db) shared by every worker
+             on the machine, in WAL mode so readers don't block the writer
+
+Values are JSON-compatible (dicts, lists, strings, numbers) and live in a
+namespace ("chat_sessions", "rag_answers", ...). Each write may give a TTL and a
+cap on the namespace's size; past the cap the least recently used entries are
+dropped (for SQLite: the least recently written, trimmed every PRUNE_EVERY
+writes). update() is an atomic read-modify-write, across processes too, for
+state that is appended to.
+
+    from state import backend
+    backend.set("rag_answers", key, answer, ttl_s=600, max_entries=1024)
+    answer = backend.get("rag_answers", key)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+# SQLite trims expired and excess rows of a namespace once per this many writes to it
+PRUNE_EVERY = 64
+
+
+class StateBackend:
+    # True when other processes see the same state (so local copies must sync)
+    shared = False
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: float = None, max_entries: int = None):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        fn: Callable[[Any], tuple[Any, Any]],
+        ttl_s: float = None,
+        max_entries: int = None,
+    ) -> Any:
+        """Atomically replaces the value with fn(value)[0] and returns fn(value)[1].
+
+        fn gets None for a missing or expired key; returning None as the new value
+        deletes the key.
+        """
+        raise NotImplementedError
+
+    def items(self, namespace: str, since: float = 0.0) -> list[tuple[str, Any, float]]:
+        """(key, value, updated_at) for live entries written at or after `since` (wall clock)."""
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    def __init__(self):
+        # namespace -> key -> (updated_at, expires_at, value), least recently used first
+        self._data: dict[str, OrderedDict] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, namespace: str, key: str):
+        # Caller holds the lock
+        entries = self._data.get(namespace)
+        entry = entries.get(key) if entries else None
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def _write(self, namespace: str, key: str, value: Any, ttl_s: float, max_entries: int):
+        # Caller holds the lock
+        now = time.time()
+        entries = self._data.setdefault(namespace, OrderedDict())
+        entries[key] = (now, now + ttl_s if ttl_s else None, value)
+        entries.move_to_end(key)
+        if max_entries:
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._live(namespace, key)
+            return default if entry is None else entry[2]
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: float = None, max_entries: int = None):
+        with self._lock:
+            self._write(namespace, key, value, ttl_s, max_entries)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+    def update(self, namespace, key, fn, ttl_s=None, max_entries=None):
+        with self._lock:
+            entry = self._live(namespace, key)
+            value, result = fn(None if entry is None else entry[2])
+            if value is None:
+                self._data.get(namespace, {}).pop(key, None)
+            else:
+                self._write(namespace, key, value, ttl_s, max_entries)
+            return result
+
+    def items(self, namespace: str, since: float = 0.0) -> list[tuple[str, Any, float]]:
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value, updated)
+                for key, (updated, expires, value) in self._data.get(namespace, {}).items()
+                if updated >= since and (expires is None or expires > now)
+            ]
+
+    def count(self, namespace: str) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(1 for _, expires, _ in self._data.get(namespace, {}).values() if expires is None or expires > now)
+
+
+class SQLiteBackend(StateBackend):
+    """One table in a local SQLite file, shared by every process that opens it.
+
+    The connection is opened on first use (not at import, so forked or spawned
+    workers each get their own). Calls are short local transactions, well under a
+    millisecond in WAL mode, so they are made inline from async code too.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = None, busy_timeout_s: float = None):
+        self.path = path or os.getenv("STATE_DB", "state.db")
+        self.busy_timeout_s = busy_timeout_s or float(os.getenv("STATE_DB_BUSY_TIMEOUT_S", "5"))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " updated_at REAL NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS state_updated ON state (namespace, updated_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _select(self, conn: sqlite3.Connection, namespace: str, key: str):
+        row = conn.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _write(self, conn: sqlite3.Connection, namespace: str, key: str, value: Any, ttl_s: float, max_entries: int):
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, updated_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now, now + ttl_s if ttl_s else None),
+        )
+        # Trimming scans the namespace, so it is batched; reads skip expired rows anyway
+        self._writes[namespace] = self._writes.get(namespace, 0) + 1
+        if self._writes[namespace] % PRUNE_EVERY != 1:
+            return
+        conn.execute("DELETE FROM state WHERE namespace = ? AND expires_at <= ?", (namespace, now))
+        if max_entries:
+            conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key IN ("
+                " SELECT key FROM state WHERE namespace = ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, max_entries),
+            )
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._select(self._connect(), namespace, key)
+        return default if value is None else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: float = None, max_entries: int = None):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write(conn, namespace, key, value, ttl_s, max_entries)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def update(self, namespace, key, fn, ttl_s=None, max_entries=None):
+        with self._lock:
+            conn = self._connect()
+            # Takes the write lock up front, so no other process can interleave
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                value, result = fn(self._select(conn, namespace, key))
+                if value is None:
+                    conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+                else:
+                    self._write(conn, namespace, key, value, ttl_s, max_entries)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def items(self, namespace: str, since: float = 0.0) -> list[tuple[str, Any, float]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key, value, updated_at FROM state WHERE namespace = ? AND updated_at >= ?"
+                " AND (expires_at IS NULL OR expires_at > ?) ORDER BY updated_at",
+                (namespace, since, time.time()),
+            ).fetchall()
+        return [(key, json.loads(value), updated) for key, value, updated in rows]
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchone()[0]
+
+
+def backend_from_env() -> StateBackend:
+    kind = os.getenv("STATE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND {kind!r} (expected memory or sqlite)")
+    return MemoryBackend()
+
+
+backend = backend_from_env()
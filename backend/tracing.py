@@ -0,0 +1,212 @@
+"""
+Request tracing with OpenTelemetry-compatible spans.
+
+Spans nest through a ContextVar, so a trace follows one request from the server
+through RAG_Agent, BrowserAgent turns and each PlaywrightComputer call:
+
+    with tracing.span("cache.lookup", prompt_chars=len(prompt)):
+        ...
+
+    @tracing.traced()
+    async def generate(self, prompt): ...
+
+Finished spans go to an exporter, picked with TRACING_EXPORTER:
+
+    (unset)   tracing is off and span() costs next to nothing
+    stdout    one JSON object per span on stdout
+    file      one JSON object per line in TRACING_FILE (default traces.jsonl)
+
+Any object with an export(span_dict) method can be plugged in with set_exporter().
+Span dicts use the OTLP/JSON field names (traceId, spanId, parentSpanId,
+startTimeUnixNano, ...) so they can be replayed into an OpenTelemetry collector.
+Incoming W3C `traceparent` headers are honoured by the server, and ContextVars do
+not cross threads, so background work passes its parent span explicitly.
+"""
+import functools
+import inspect
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: dict = field(default_factory=dict)
+    status: str = "UNSET"  # UNSET | OK | ERROR
+    status_message: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message or ""},
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off."""
+
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def update_name(self, name: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class StdoutExporter:
+    def __init__(self, stream=None):
+        self._stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def export(self, span: dict):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+def _exporter_from_env():
+    kind = os.getenv("TRACING_EXPORTER", "").lower()
+    if kind == "stdout":
+        return StdoutExporter()
+    if kind == "file":
+        return FileExporter(os.getenv("TRACING_FILE", "traces.jsonl"))
+    return None
+
+
+_exporter = _exporter_from_env()
+_current: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def set_exporter(exporter):
+    """Installs an exporter (or None to switch tracing off)."""
+    global _exporter
+    _exporter = exporter
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Span]:
+    """Parent for a request that arrives with a W3C traceparent header, if valid."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return Span(name="remote", trace_id=parts[1], span_id=parts[2])
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attributes):
+    """Runs the with-block inside a new span, a child of `parent` or the current span."""
+    if _exporter is None:
+        yield NOOP_SPAN
+        return
+
+    parent = parent or _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current.set(current)
+    try:
+        yield current
+        if current.status == "UNSET":
+            current.status = "OK"
+    except (GeneratorExit, KeyboardInterrupt):
+        raise
+    except BaseException as e:
+        # Cancellation is not a failure of the traced code, but worth seeing
+        if type(e).__name__ in ("CancelledError", "Cancelled"):
+            current.set_attribute("cancelled", True)
+        else:
+            current.status, current.status_message = "ERROR", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # An async generator finished in a different context than it started in
+            pass
+        _exporter.export(current.to_dict())
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: runs every call of a function (sync, async or async generator) in a span."""
+
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with span(span_name):
+                    agen = fn(*args, **kwargs)
+                    try:
+                        async for item in agen:
+                            yield item
+                    finally:
+                        await agen.aclose()
+        elif inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with span(span_name):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -15,6 +15,7 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
+from knight_source_urls import KNIGHT_SOURCE_URLS
 from scraper_agent import Scraper
 
 DEFAULT_UA = "KnightSource-LinkChecker/1.0 (+https://knightsource.example)"
@@ -291,34 +292,7 @@ def freshness_label(detected_year: Optional[str], expected_cycle: Tuple[int, int
 
 def main():
     # KnightSource registry (category -> list of URLs we currently publish)
-    knight_source_urls_dict: Dict[str, List[str]] = {
-        "Conference Registration and Travel at UCF": [
-            "https://studentgovernment.ucf.edu/wp-content/uploads/sites/4/2024/10/CRT-Spending-Policy-24-25-Title-VIII-Appendix-A.pdf",
-            "https://knightconnect.campuslabs.com/engage/submitter/form/start/636439",
-            "https://knightconnect.campuslabs.com/engage/submitter/form/start/636440",
-            "https://webcourses.ucf.edu/enroll/4FCC68",
-        ],
-        "A2O Scholarships at UCF": ["https://ucf.academicworks.com"],
-        "Dental care at UCF": ["https://studenthealth.ucf.edu/services/dental/"],
-        "Legal DUI at UCF": ["http://sls.sdes.ucf.edu/"],
-        "Lawyer": ["https://sls.sswb.ucf.edu/info/"],
-        "Outdoor Adventure Challenge Course at UCF": [
-            "https://ucfrwc.org/booking/54e23deb-011a-4743-94df-b986b042dab1",
-            "https://rwc.sswb.ucf.edu/programs/outdoor-adventure/challenge-course/",
-        ],
-        "Reservations at Recreation and Wellness Center": [
-            "http://ucf.qualtrics.com/jfe/form/SV_5uq5qcKL9OIWd49"
-        ],
-        "Sign up for intramural sports at UCF": [
-            "https://imleagues.com/spa/intramural/136f2fd71bae48bc8ee2f37e418505d9/home"
-        ],
-        "Reserve Outdoor Equipment at the Outdoor Adventure": [
-            "https://ucf.qualtrics.com/jfe/form/SV_ewAQOlYlr2Xg1A9",
-            "https://rwc.sswb.ucf.edu/wp-content/uploads/sites/32/2020/02/OAC-Equipment-Rental-Fees-revised-06.2019.pdf",
-            "https://rwc.sswb.ucf.edu/facilities/outdoor-adventure-center/",
-        ],
-        "Ticket Center at UCF": ["https://ticketcenter.sdes.ucf.edu/"],
-    }
+    knight_source_urls_dict: Dict[str, List[str]] = KNIGHT_SOURCE_URLS
 
     # Hints for canonical discovery by category (expand per category as needed)
     search_hints = {
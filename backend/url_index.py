@@ -0,0 +1,208 @@
+"""
+Intent-to-URL index: picks the page a browser task should start on.
+
+Browser tasks default to a search engine, and the agent then spends several
+turns searching for a page we already publish. This index maps the task text to
+the best known starting URL instead, from:
+
+- the KnightSource registry (knight_source_urls.py), and
+- the buttonLink of every subcategory in frontend/content/categories/*.json,
+  described by its name, button text, category title and the start of its
+  description.
+
+Documents are TF-IDF vectors over the same normalized words as the semantic
+cache, less a few words every browser task uses ("look up", "today"). A task
+gets the URL of its most similar document if the cosine similarity is at least
+URL_INDEX_MIN_SCORE and they share at least two words; a single shared word
+must reach URL_INDEX_ONE_WORD_SCORE. Task words no document has still count
+(with the weight of the most common word), so a task isn't matched on the one
+word of it we happen to know. The index is built on first use and
+rebuilt when a category file is added, removed or modified (checked at most
+every URL_INDEX_CHECK_S seconds).
+
+    python url_index.py "sign me up for intramural basketball"
+    python url_index.py --list
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+import metrics
+from knight_source_urls import KNIGHT_SOURCE_URLS
+from semantic_cache import Vector, cosine, normalize
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+
+# Hosts whose home page is just a place to start searching from
+SEARCH_ENGINES = {"google.com", "www.google.com", "bing.com", "www.bing.com", "duckduckgo.com", "www.duckduckgo.com"}
+DEFAULT_START_URL = "http://www.google.com"
+URL_PATTERN = re.compile(r"https?://\S+")
+# Words of a subcategory's description that go into its document
+DESCRIPTION_WORDS = 40
+# Words of how a task is asked, not what it is about
+TASK_STOPWORDS = {"up", "today", "now", "look", "find", "go", "open", "check", "help", "need"}
+# Weight of a task word no document has: the idf of a word every document has
+UNKNOWN_WORD_IDF = 1.0
+
+
+@dataclass
+class Document:
+    url: str
+    source: str  # "registry" | "categories"
+    title: str
+    text: str
+
+
+def url_words(url: str) -> str:
+    """Readable words from a URL's host and path ("outdoor-adventure/challenge-course/" -> ...)."""
+    parsed = urlparse(url)
+    words = re.split(r"[^a-zA-Z]+", f"{parsed.netloc} {parsed.path}")
+    # Drop ids and boilerplate; keep words long enough to mean something
+    return " ".join(w for w in words if len(w) > 2 and w.lower() not in ("www", "edu", "com", "org", "https", "http"))
+
+
+def task_words(text: str) -> Counter:
+    return Counter(word for word in normalize(text) if word not in TASK_STOPWORDS)
+
+
+def is_search_start(url: Optional[str]) -> bool:
+    """True for no URL or a search engine's home page, i.e. no real starting point."""
+    if not url:
+        return True
+    parsed = urlparse(url if "://" in url else "http://" + url)
+    return parsed.netloc.lower() in SEARCH_ENGINES and parsed.path in ("", "/")
+
+
+def load_documents(frontend_dir: str = FRONTEND_DIR) -> list[Document]:
+    docs = []
+    for title, urls in KNIGHT_SOURCE_URLS.items():
+        for url in urls:
+            docs.append(Document(url, "registry", title, f"{title} {title} {url_words(url)}"))
+
+    for path in sorted(glob.glob(os.path.join(frontend_dir, "content", "categories", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            category = json.load(f)
+        for sub in category.get("subcategories", []):
+            # Some buttonLinks carry a label ("Website: https://...")
+            match = URL_PATTERN.search(sub.get("buttonLink") or "")
+            if not match:
+                continue
+            name = sub.get("name", "")
+            description = " ".join((sub.get("description_md") or "").split()[:DESCRIPTION_WORDS])
+            # The name counts double: it is the most specific text we have
+            text = f"{name} {name} {sub.get('buttonDescription', '')} {category.get('title', '')} {description}"
+            docs.append(Document(match.group(0).rstrip(").,"), "categories", name, text))
+
+    # PDFs are documents, not pages to act on
+    return [doc for doc in docs if not urlparse(doc.url).path.lower().endswith(".pdf")]
+
+
+class UrlIndex:
+    def __init__(self, frontend_dir: str = FRONTEND_DIR, min_score: float = None, check_s: float = None):
+        self.frontend_dir = frontend_dir
+        self.min_score = min_score if min_score is not None else float(os.getenv("URL_INDEX_MIN_SCORE", "0.2"))
+        self.one_word_score = float(os.getenv("URL_INDEX_ONE_WORD_SCORE", "0.4"))
+        self.check_s = check_s if check_s is not None else float(os.getenv("URL_INDEX_CHECK_S", "30"))
+        self.docs: list[Document] = []
+        self.vectors: list[Vector] = []
+        self.idf: dict[str, float] = {}
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sources_fingerprint(self) -> tuple:
+        paths = sorted(glob.glob(os.path.join(self.frontend_dir, "content", "categories", "*.json")))
+        return tuple((path, os.path.getmtime(path)) for path in paths)
+
+    def _build(self):
+        # Caller holds the lock
+        docs = load_documents(self.frontend_dir)
+        counts = [task_words(doc.text) for doc in docs]
+        df = Counter(word for words in counts for word in words)
+        n = len(docs)
+        self.idf = {word: math.log((1 + n) / (1 + count)) + 1 for word, count in df.items()}
+        self.docs, self.vectors = docs, [self._vector(words) for words in counts]
+
+    def _vector(self, words: Counter) -> Vector:
+        # Words outside the index still weigh in the norm; no document can match them
+        weights = {word: count * self.idf.get(word, UNKNOWN_WORD_IDF) for word, count in words.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {word: w / norm for word, w in weights.items()}
+
+    def _scored(self, text: str) -> list[tuple[float, int, Document]]:
+        """(similarity, shared words, document), best first."""
+        self.refresh()
+        query = self._vector(task_words(text))
+        scored = [
+            (cosine(query, vector), len(query.keys() & vector.keys()), doc)
+            for vector, doc in zip(self.vectors, self.docs)
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    def refresh(self):
+        """Rebuilds the index if the category files changed since it was built."""
+        with self._lock:
+            now = time.monotonic()
+            if self._fingerprint is not None and now - self._checked_at < self.check_s:
+                return
+            self._checked_at = now
+            fingerprint = self._sources_fingerprint()
+            if fingerprint != self._fingerprint:
+                self._build()
+                self._fingerprint = fingerprint
+
+    def search(self, text: str, k: int = 3) -> list[tuple[float, Document]]:
+        return [(score, doc) for score, _, doc in self._scored(text)[:k]]
+
+    def accepts(self, score: float, shared: int) -> bool:
+        return score >= self.min_score and (shared >= 2 or score >= self.one_word_score)
+
+    def lookup(self, text: str) -> Optional[Document]:
+        """The best known page for a task, or None if nothing is similar enough."""
+        best = self._scored(text)[:1]
+        if best and self.accepts(best[0][0], best[0][1]):
+            return best[0][2]
+        return None
+
+
+index = UrlIndex()
+
+
+def starting_url(task: str, initial_url: Optional[str] = None) -> str:
+    """Where a browser task should start: the caller's URL unless it is only a
+    search engine, else the best match from the index, else the search engine."""
+    if not is_search_start(initial_url):
+        metrics.START_URLS.inc(source="given")
+        return initial_url
+    doc = index.lookup(task)
+    if doc is None:
+        metrics.START_URLS.inc(source="default")
+        return initial_url or DEFAULT_START_URL
+    metrics.START_URLS.inc(source="index")
+    return doc.url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("task", nargs="?", help="task text to look up")
+    parser.add_argument("--list", action="store_true", help="print every indexed document")
+    args = parser.parse_args()
+
+    if args.list or not args.task:
+        index.refresh()
+        for doc in index.docs:
+            print(f"{doc.source:<11} {doc.title[:50]:<50} {doc.url}")
+    else:
+        for score, shared, doc in index._scored(args.task)[:5]:
+            marker = "*" if index.accepts(score, shared) else " "
+            print(f"{marker} {score:.3f} {shared:>2}  {doc.title[:50]:<50} {doc.url}")
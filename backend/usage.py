@@ -0,0 +1,280 @@
+"""
+Token usage accounting and budgets for Gemini calls.
+
+Wrap a unit of work in track_usage() and every response passed to record() inside
+it (in the same task or thread context) is added to the yielded Usage:
+
+    with track_usage() as usage:
+        answer = await agent.generate(prompt)
+    print(usage.total_tokens)
+
+The server uses metered() instead, which also gives the request a Budget and
+charges what it used to its session and user in the ledger. Budgets cap tokens,
+wall-clock seconds and BrowserAgent steps, and all default to unlimited:
+
+    BUDGET_REQUEST_TOKENS / _SECONDS          per /chat, /RAG, ... request
+    BUDGET_BROWSER_TOKENS / _SECONDS / _STEPS per browser job
+    BUDGET_SESSION_TOKENS, BUDGET_USER_TOKENS per BUDGET_WINDOW_S (default a day)
+
+Running low degrades instead of failing: fit_config() drops thinking and caps
+the output once the tokens or time left get short, and BrowserAgent stops its
+loop early. Only a session or user with nothing left is refused (BudgetExceeded).
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from google.genai import types
+
+import metrics
+import state
+
+# Calls made with less than this left run without thinking, the slow and costly part
+THINKING_RESERVE_TOKENS = int(os.getenv("BUDGET_THINKING_RESERVE_TOKENS", "4096"))
+FAST_BELOW_S = float(os.getenv("BUDGET_FAST_BELOW_S", "15"))
+MIN_OUTPUT_TOKENS = 256
+
+
+class BudgetExceeded(Exception):
+    """Raised by metered() when the session or user has no tokens left."""
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+@dataclass
+class Budget:
+    tokens: Optional[int] = None
+    seconds: Optional[float] = None
+    steps: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "Budget":
+        """E.g. prefix "BUDGET_BROWSER" reads BUDGET_BROWSER_TOKENS, _SECONDS and _STEPS."""
+        return cls(
+            tokens=_env_number(f"{prefix}_TOKENS", int),
+            seconds=_env_number(f"{prefix}_SECONDS", float),
+            steps=_env_number(f"{prefix}_STEPS", int),
+        )
+
+
+@dataclass
+class Usage:
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    thinking_tokens: int = 0
+    calls: int = 0
+    steps: int = 0
+    budget: Budget = field(default_factory=Budget)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens + self.thinking_tokens
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.monotonic() - self.started
+
+    def add(self, metadata: Optional[types.GenerateContentResponseUsageMetadata]):
+        self.calls += 1
+        if metadata is None:
+            return
+        self.prompt_tokens += metadata.prompt_token_count or 0
+        self.output_tokens += metadata.candidates_token_count or 0
+        self.thinking_tokens += metadata.thoughts_token_count or 0
+
+    def merge(self, other: "Usage"):
+        self.prompt_tokens += other.prompt_tokens
+        self.output_tokens += other.output_tokens
+        self.thinking_tokens += other.thinking_tokens
+        self.calls += other.calls
+        self.steps += other.steps
+
+    def tokens_left(self) -> Optional[int]:
+        if self.budget.tokens is None:
+            return None
+        return self.budget.tokens - self.total_tokens
+
+    def seconds_left(self) -> Optional[float]:
+        if self.budget.seconds is None:
+            return None
+        return self.budget.seconds - self.elapsed_s
+
+    def exhausted(self) -> Optional[str]:
+        """Which budget has run out, if any."""
+        tokens_left, seconds_left = self.tokens_left(), self.seconds_left()
+        if tokens_left is not None and tokens_left <= 0:
+            return "token budget"
+        if seconds_left is not None and seconds_left <= 0:
+            return "time budget"
+        if self.budget.steps is not None and self.steps >= self.budget.steps:
+            return "step budget"
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "thinking_tokens": self.thinking_tokens,
+            "total_tokens": self.total_tokens,
+            "calls": self.calls,
+            "steps": self.steps,
+        }
+
+
+class Ledger:
+    """Usage totals per session and per user over a fixed window, for session/user budgets.
+
+    Kept in the state backend (see state.py), so with a shared backend a budget
+    holds across all server workers instead of per worker.
+    """
+
+    COUNTERS = ("prompt_tokens", "output_tokens", "thinking_tokens", "calls", "steps")
+
+    def __init__(self, window_s: float = None, max_keys: int = 10000, backend: state.StateBackend = None):
+        self.window_s = window_s or float(os.getenv("BUDGET_WINDOW_S", "86400"))
+        self.max_keys = max_keys
+        self.limits = {
+            "session": _env_number("BUDGET_SESSION_TOKENS", int),
+            "user": _env_number("BUDGET_USER_TOKENS", int),
+        }
+        self.namespace = "usage"
+        self.backend = backend or state.backend
+
+    def _load(self, data: Optional[dict]) -> Usage:
+        """The Usage of a stored entry; empty if there is none or its window has passed."""
+        if data is None or time.time() - data["window_start"] >= self.window_s:
+            return Usage()
+        return Usage(**{name: data[name] for name in self.COUNTERS})
+
+    def _total(self, kind: str, key: str) -> Usage:
+        return self._load(self.backend.get(self.namespace, f"{kind}:{key}"))
+
+    def charge(self, usage: Usage, session_id: str = None, user_id: str = None):
+        for kind, key in (("session", session_id), ("user", user_id)):
+            if not key:
+                continue
+
+            def add(data):
+                if data is None or time.time() - data["window_start"] >= self.window_s:
+                    data = {"window_start": time.time(), **{name: 0 for name in self.COUNTERS}}
+                for name in self.COUNTERS:
+                    data[name] += getattr(usage, name)
+                return data, None
+
+            self.backend.update(self.namespace, f"{kind}:{key}", add, ttl_s=self.window_s, max_entries=self.max_keys)
+
+    def totals(self, kind: str, key: str) -> dict:
+        total = self._total(kind, key)
+        limit = self.limits[kind]
+        return {
+            **total.to_dict(),
+            "limit_tokens": limit,
+            "tokens_left": None if limit is None else limit - total.total_tokens,
+        }
+
+    def tokens_left(self, session_id: str = None, user_id: str = None) -> Optional[int]:
+        """The smaller of what the session and the user have left, or None if neither is limited."""
+        left = None
+        for kind, key in (("session", session_id), ("user", user_id)):
+            limit = self.limits[kind]
+            if key and limit is not None:
+                remaining = limit - self._total(kind, key).total_tokens
+                left = remaining if left is None else min(left, remaining)
+        return left
+
+
+ledger = Ledger()
+_current: ContextVar[Optional[Usage]] = ContextVar("usage", default=None)
+
+
+@contextmanager
+def track_usage(budget: Budget = None):
+    usage = Usage(budget=budget or Budget())
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # An async generator finished in a different context than it started in
+            pass
+
+
+@contextmanager
+def metered(session_id: str = None, user_id: str = None, budget: Budget = None):
+    """Tracks one request under its budget, capped by what its session and user have left.
+
+    Raises BudgetExceeded up front if either has nothing left; charges the usage
+    to both when the block ends, whether or not it raised.
+    """
+    budget = budget or Budget.from_env("BUDGET_REQUEST")
+    left = ledger.tokens_left(session_id, user_id)
+    if left is not None:
+        if left <= 0:
+            raise BudgetExceeded("Token budget for this session or user is used up; try again later")
+        budget = replace(budget, tokens=left if budget.tokens is None else min(budget.tokens, left))
+    with track_usage(budget) as usage:
+        try:
+            yield usage
+        finally:
+            ledger.charge(usage, session_id, user_id)
+
+
+def current() -> Optional[Usage]:
+    return _current.get()
+
+
+def record(response: types.GenerateContentResponse):
+    """Adds the response's usage_metadata to the usage being tracked, if any, and to the token metrics."""
+    metadata = response.usage_metadata
+    if metadata is not None:
+        metrics.TOKENS.inc(metadata.prompt_token_count or 0, kind="input")
+        metrics.TOKENS.inc(metadata.candidates_token_count or 0, kind="output")
+        metrics.TOKENS.inc(metadata.thoughts_token_count or 0, kind="thinking")
+    usage = _current.get()
+    if usage is not None:
+        usage.add(response.usage_metadata)
+
+
+def record_step():
+    """Counts one BrowserAgent turn against the current budget."""
+    usage = _current.get()
+    if usage is not None:
+        usage.steps += 1
+
+
+def exhausted() -> Optional[str]:
+    """Which budget of the current unit of work has run out, if any."""
+    usage = _current.get()
+    return usage.exhausted() if usage is not None else None
+
+
+def fit_config(config: types.GenerateContentConfig) -> tuple[types.GenerateContentConfig, bool]:
+    """Cuts config down to the current budget. Returns (config, degraded).
+
+    With few tokens or little time left the call runs without thinking and its
+    output is capped to the tokens that remain.
+    """
+    usage = _current.get()
+    if usage is None:
+        return config, False
+    tokens_left, seconds_left = usage.tokens_left(), usage.seconds_left()
+    max_output = config.max_output_tokens
+    low_tokens = tokens_left is not None and tokens_left < (max_output or 0) + THINKING_RESERVE_TOKENS
+    low_time = seconds_left is not None and seconds_left < FAST_BELOW_S
+    if not (low_tokens or low_time):
+        return config, False
+
+    update = {"thinking_config": types.ThinkingConfig(thinking_budget=0)}
+    if tokens_left is not None:
+        capped = max(MIN_OUTPUT_TOKENS, tokens_left)
+        update["max_output_tokens"] = min(max_output, capped) if max_output else capped
+    return config.model_copy(update=update), True
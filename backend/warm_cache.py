@@ -0,0 +1,117 @@
+"""
+Cache warm-up: pre-generates answers for the topics we already publish.
+
+Questions are built from the subcategories in frontend/content/categories/*.json
+and the notes under frontend/notes/**, then run through RAG_Agent.generate with
+bounded parallelism so the answer caches are filled before real users arrive.
+
+The caches live in the serving process, so the useful way to run this is the
+server's startup hook (WARM_CACHE_ON_STARTUP=1). Running it as a script reports
+per-question latency and token usage:
+
+    python warm_cache.py --concurrency 4
+    python warm_cache.py --list        # only print the question set
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+
+from usage import track_usage
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+
+QUESTION_TEMPLATES = [
+    "What is {topic}?",
+    "Who is eligible for {topic} and what are the requirements?",
+    "How much money can I save with {topic}?",
+]
+
+
+def load_topics(frontend_dir: str = FRONTEND_DIR) -> list[str]:
+    topics = []
+    for path in sorted(glob.glob(os.path.join(frontend_dir, "content", "categories", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            category = json.load(f)
+        for sub in category.get("subcategories", []):
+            topics.append(sub["name"])
+
+    for path in sorted(glob.glob(os.path.join(frontend_dir, "notes", "**", "*.txt"), recursive=True)):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        # Notes start with "**Subcategory name:**" followed by the name on the next line
+        m = re.search(r"\*\*Subcategory name:\*\*\s*\n\s*(.+)", text)
+        if m:
+            topics.append(m.group(1).strip())
+
+    # Categories and notes describe the same subcategories; keep the first spelling
+    seen, unique = set(), []
+    for topic in topics:
+        key = " ".join(re.findall(r"[a-z0-9]+", topic.lower()))
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(topic)
+    return unique
+
+
+def build_questions(frontend_dir: str = FRONTEND_DIR) -> list[str]:
+    return [template.format(topic=topic) for topic in load_topics(frontend_dir) for template in QUESTION_TEMPLATES]
+
+
+async def warm(agent, questions: list[str], concurrency: int = 4) -> list[dict]:
+    """Runs every question through agent.generate, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(question: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            with track_usage() as usage:
+                try:
+                    await agent.generate(question)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+            return {
+                "question": question,
+                "latency_s": round(time.perf_counter() - start, 3),
+                # No upstream call means the answer was already cached
+                "cached": usage.calls == 0 and error is None,
+                "error": error,
+                **usage.to_dict(),
+            }
+
+    return await asyncio.gather(*(run(q) for q in questions))
+
+
+def print_report(results: list[dict], wall_s: float):
+    print(f"{'latency':>8} {'tokens':>7}  question")
+    for r in results:
+        status = "error: " + r["error"] if r["error"] else ("cached" if r["cached"] else "")
+        print(f"{r['latency_s']:>7.2f}s {r['total_tokens']:>7}  {r['question']} {status}")
+    total_tokens = sum(r["total_tokens"] for r in results)
+    errors = sum(1 for r in results if r["error"])
+    print(f"\n{len(results)} questions in {wall_s:.1f}s, {total_tokens} tokens, {errors} errors")
+
+
+async def main(concurrency: int):
+    from RAG_agent import RAG_Agent
+
+    questions = build_questions()
+    start = time.perf_counter()
+    results = await warm(RAG_Agent(), questions, concurrency)
+    print_report(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--list", action="store_true", help="Print the question set and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(build_questions()))
+    else:
+        asyncio.run(main(args.concurrency))
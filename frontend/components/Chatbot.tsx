@@ -52,47 +52,59 @@ export function Chatbot() {
     setInput('');
     setIsTyping(true);
 
-    // Call RAG
+    // Call RAG (streamed as Server-Sent Events so the answer renders as it is generated)
+    const botId = (Date.now() + 1).toString();
     try {
-      const endpoint = `http://localhost:8000/RAG?prompt=${encodeURIComponent(text)}`;
+      const endpoint = `http://localhost:8000/RAG/stream?prompt=${encodeURIComponent(text)}`;
       const res = await fetch(endpoint, {
         method: 'GET',
         headers: {
-          'Accept': 'text/plain',
+          'Accept': 'text/event-stream',
         },
       });
 
-      console.error("res", res);
-
-      let botText: string;
-      if (res.ok) {
-        // assume the service returns plain text
-        botText = await res.text();
-      } else {
-        // fallback to local generator if remote fails
-        console.error('RAG request failed', res.status, await res.text());
-        botText = generateResponse(text.toLowerCase());
+      if (!res.ok || !res.body) {
+        throw new Error(`RAG request failed: ${res.status}`);
       }
 
-      console.log("botText", botText);
-
-      // Handle responses that may be JSON-wrapped or contain escaped newlines
-      let parsedText = botText;
-      try {
-        const maybeJson = JSON.parse(botText);
-        if (typeof maybeJson === 'string') {
-          parsedText = maybeJson;
-        } else if (maybeJson?.response) {
-          parsedText = maybeJson.response;
-        } else if (maybeJson?.answer) {
-          parsedText = maybeJson.answer;
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let streamed = '';
+      let finalText: string | null = null;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE frames are separated by a blank line; keep any partial frame for the next read
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop() ?? '';
+
+        for (const frame of frames) {
+          const data = frame
+            .split('\n')
+            .filter((line) => line.startsWith('data:'))
+            .map((line) => line.slice(5).trim())
+            .join('\n');
+          if (!data) continue;
+
+          const event = JSON.parse(data);
+          if (event.type === 'text' || event.type === 'tool_result') {
+            streamed += event.text;
+            upsertBotMessage(botId, streamed);
+            setIsTyping(false);
+          } else if (event.type === 'done') {
+            finalText = event.text;
+          } else if (event.type === 'error') {
+            throw new Error(event.message);
+          }
         }
-      } catch (e) {
-        // not JSON — keep original
       }
 
       // Convert escaped newlines and HTML breaks to real newlines
-      parsedText = parsedText.replace(/\\n/g, '\n').replace(/<br\s*\/?>/gi, '\n');
+      const parsedText = (finalText ?? streamed).replace(/\\n/g, '\n').replace(/<br\s*\/?>/gi, '\n');
 
       // Split into paragraphs on one or more blank lines (double newlines)
       const paragraphs = parsedText
@@ -100,34 +112,32 @@ export function Chatbot() {
         .map((p) => p.replace(/\n+/g, ' ').trim())
         .filter(Boolean);
 
-      console.log("paragraphs", paragraphs);
-
-      const botMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: parsedText,
-        paragraphs,
-        sender: 'bot',
-        timestamp: new Date(),
-      };
-
-      setMessages((prev) => [...prev, botMessage]);
+      upsertBotMessage(botId, parsedText, paragraphs);
     } catch (err) {
       console.error('RAG request error', err);
       const fallbackText = generateResponse(text.toLowerCase());
       const paragraphs = fallbackText.split(/\n+/).map((p) => p.trim()).filter(Boolean);
-      const botMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: fallbackText,
-        paragraphs,
-        sender: 'bot',
-        timestamp: new Date(),
-      };
-      setMessages((prev) => [...prev, botMessage]);
+      upsertBotMessage(botId, fallbackText, paragraphs);
     } finally {
       setIsTyping(false);
     }
   };
 
+  const upsertBotMessage = (id: string, text: string, paragraphs?: string[]) => {
+    const botMessage: Message = {
+      id,
+      text,
+      paragraphs,
+      sender: 'bot',
+      timestamp: new Date(),
+    };
+    setMessages((prev) =>
+      prev.some((m) => m.id === id)
+        ? prev.map((m) => (m.id === id ? botMessage : m))
+        : [...prev, botMessage]
+    );
+  };
+
   const generateResponse = (query: string): string => {
     if (query.includes('funding') || query.includes('money') || query.includes('qualify')) {
       return "Based on your query, here are some funding opportunities:\n\n• Conference Travel: Up to $1,500 for RSOs + $150 per presenter (max $3,000)\n• Individual Presenters: Up to $400\n\nWould you like more details about any of these?";